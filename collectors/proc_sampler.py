@@ -0,0 +1,329 @@
+"""
+collectors/proc_sampler.py
+
+/proc and /sys readers shared by the substrate collector.
+
+Kept in one module so that sampling optimisations (persistent fds, bytes
+parsing, pidfd liveness) only have to land once.  The collector imports
+these when run as a script from collectors/:
+
+    from proc_sampler import read_proc_stat_cpu, read_proc_pid_stat, ...
+
+All readers take already-open fds where the file is re-read every sample
+(open once with open_proc_fd(), close when sampling ends).
+"""
+
+import os
+import select
+from typing import Dict, List, Set, Tuple, Optional
+
+
+# ─────────────────────────────────────────────────────────
+# /proc sampling
+# ─────────────────────────────────────────────────────────
+
+def open_proc_fd(path: str) -> int:
+    """Open a /proc file once for repeated os.pread() sampling."""
+    return os.open(path, os.O_RDONLY)
+
+
+# The aggregate "cpu ..." line is ~10 counters; 512 bytes holds it with room
+# to spare, so the per-CPU lines after it are never copied to userspace.
+PROC_STAT_FIRST_LINE_BYTES = 512
+
+
+def read_proc_stat_cpu(stat_fd: int,
+                       buf: Optional[bytearray] = None) -> Tuple[int, int]:
+    """Return (total_jiffies, idle_jiffies) from an open /proc/stat fd.
+
+    pread at offset 0 re-generates the file each call, so the fd can be
+    kept open for the whole run (no open/close per sample).  Only the first
+    PROC_STAT_FIRST_LINE_BYTES are read, into buf when one is given.
+    """
+    if buf is None:
+        buf = os.pread(stat_fd, PROC_STAT_FIRST_LINE_BYTES, 0)
+        n = len(buf)
+    else:
+        n = os.preadv(stat_fd, [buf], 0)
+    nl = buf.find(b"\n", 0, n)
+    parts = buf[:nl].split() if nl != -1 else []
+    if not parts or parts[0] != b"cpu":
+        raise RuntimeError("Unexpected /proc/stat format (first line not 'cpu ...')")
+
+    values = list(map(int, parts[1:]))
+    total = sum(values)
+
+    idle = values[3]
+    if len(values) > 4:
+        idle += values[4]
+
+    return total, idle
+
+
+# Field positions counted from the first field after "comm)" (i.e. state = 0)
+_PID_STAT_UTIME = 11
+_PID_STAT_STIME = 12
+_PID_STAT_RSS   = 21
+
+
+PID_STAT_BUF_BYTES = 4096
+
+
+def read_proc_pid_stat(pid_fd: int,
+                       buf: Optional[bytearray] = None) -> Tuple[int, int, int]:
+    """Return (utime, stime, rss_pages) from an open /proc/<pid>/stat fd.
+
+    Walks the space-separated fields with find() and converts only the
+    three needed ones, instead of split()ing all ~50 fields every sample.
+    Pass a reusable bytearray(PID_STAT_BUF_BYTES) to read with preadv()
+    into it rather than allocating a new bytes object per call.
+    """
+    if buf is None:
+        buf = os.pread(pid_fd, PID_STAT_BUF_BYTES, 0)
+        n = len(buf)
+    else:
+        n = os.preadv(pid_fd, [buf], 0)
+
+    rparen = buf.rfind(b")", 0, n)
+    if rparen == -1:
+        raise RuntimeError("Unexpected format in /proc/<pid>/stat: missing ')'")
+
+    pos = rparen + 2  # skip ") "
+    for _ in range(_PID_STAT_UTIME):
+        pos = buf.find(b" ", pos, n) + 1
+    end = buf.find(b" ", pos, n)
+    utime = int(buf[pos:end])
+
+    pos = end + 1
+    end = buf.find(b" ", pos, n)
+    stime = int(buf[pos:end])
+
+    pos = end + 1
+    for _ in range(_PID_STAT_RSS - _PID_STAT_STIME - 1):
+        pos = buf.find(b" ", pos, n) + 1
+    end = buf.find(b" ", pos, n)
+    rss_pages = int(buf[pos:end])
+
+    return utime, stime, rss_pages
+
+
+def pid_exists(pid: int) -> bool:
+    """Liveness via kill(pid, 0): one syscall, no /proc path walk."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:     # exists, owned by another user (the LLM container)
+        return True
+    return True
+
+
+def open_pidfd(pid: int) -> Optional[int]:
+    """Return a pidfd for pid (Linux >= 5.3), or None if unsupported.
+
+    A pidfd refers to this exact process, so it cannot be fooled by PID
+    reuse the way a kill(pid, 0) liveness check can.
+    """
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def pidfd_exited(pidfd: int, timeout_s: float = 0.0) -> bool:
+    """True once the process behind pidfd has exited (pidfd polls readable).
+
+    With timeout_s > 0 this doubles as the sampler's inter-sample sleep:
+    it returns as soon as the process exits instead of after the full wait.
+    """
+    return bool(select.select([pidfd], [], [], timeout_s)[0])
+
+
+def parse_cpu_list(text: str) -> Set[int]:
+    """Parse a kernel cpulist ("0-3,8,10-11") into a set of CPU numbers."""
+    cpus = set()
+    for part in text.strip().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def read_isolated_cpus() -> Set[int]:
+    """CPUs removed from the scheduler by isolcpus= (empty if none)."""
+    try:
+        with open("/sys/devices/system/cpu/isolated", "r", encoding="utf-8") as f:
+            return parse_cpu_list(f.read())
+    except OSError:
+        return set()
+
+
+# ─────────────────────────────────────────────────────────
+# HAT-relevant /proc and /sys reads
+# ─────────────────────────────────────────────────────────
+
+PROC_TABLE_BUF_BYTES = 1 << 16
+
+
+def _read_fd_into(fd: int, buf: bytearray) -> memoryview:
+    """Re-read a whole seq_file-backed /proc file into buf, growing it if needed.
+
+    seq_file reads return at most one page per call, so a single read() is
+    not enough for /proc/interrupts on many-core hosts.
+    """
+    os.lseek(fd, 0, os.SEEK_SET)
+    view = memoryview(buf)
+    n = 0
+    while True:
+        if n == len(buf):
+            view.release()
+            buf.extend(bytes(len(buf)))
+            view = memoryview(buf)
+        got = os.readv(fd, [view[n:]])
+        if got == 0:
+            return view[:n]
+        n += got
+
+
+def _iter_per_cpu_table(data):
+    """Yield (name, total) for each row of a per-CPU counter table
+    (/proc/interrupts, /proc/softirqs); name is bytes without the colon.
+
+    The header row gives the CPU count; each row is "NAME: <count per CPU>"
+    optionally followed by a description, so at most n_cpu tokens after the
+    name are counts and the first non-numeric token ends them.
+    """
+    lines = bytes(data).split(b"\n")
+    n_cpu = len(lines[0].split())
+    for line in lines[1:]:
+        parts = line.split(None, n_cpu + 1)
+        if not parts:
+            continue
+        counts = parts[1:n_cpu + 1]
+        try:
+            total = sum(map(int, counts))     # full row: map/sum stay in C
+        except ValueError:
+            # Short row followed by a description: sum up to the first word
+            total = 0
+            for tok in counts:
+                if not 48 <= tok[0] <= 57:   # b"0" .. b"9"
+                    break
+                total += int(tok)
+        yield parts[0].rstrip(b":"), total
+
+
+def _parse_per_cpu_table(data) -> dict:
+    return {name.decode(): total for name, total in _iter_per_cpu_table(data)}
+
+
+def _read_per_cpu_table(path: str, fd: Optional[int],
+                        buf: Optional[bytearray]) -> dict:
+    try:
+        if fd is None:
+            with open(path, "rb") as f:
+                return _parse_per_cpu_table(f.read())
+        return _parse_per_cpu_table(_read_fd_into(fd, buf))
+    except Exception:
+        return {}
+
+
+def read_proc_interrupts(fd: Optional[int] = None,
+                         buf: Optional[bytearray] = None) -> dict:
+    """Parse /proc/interrupts -> {irq_name: total_count_across_cpus}.
+
+    Key HAT rows: SPU (spurious), NMI, PMI (perf counter overflow),
+    MCE (machine check), TLB (shootdown), LOC (local APIC timer),
+    RES (rescheduling IPI), CAL (function call IPI).
+
+    In the sampling loop pass an fd from open_proc_fd() and a reusable
+    bytearray(PROC_TABLE_BUF_BYTES); without them the file is opened once.
+    """
+    return _read_per_cpu_table("/proc/interrupts", fd, buf)
+
+
+def read_proc_interrupts_into(fd: int, buf: bytearray, row: list,
+                              col_idx: Dict[bytes, int]) -> None:
+    """Write /proc/interrupts totals straight into row[col_idx[irq_name]].
+
+    Sampling-loop variant of read_proc_interrupts(): no per-tick dict.
+    IRQ names absent from col_idx (e.g. a device IRQ registered mid-run)
+    are skipped; on a read error the row is left as it was.
+    """
+    try:
+        for name, total in _iter_per_cpu_table(_read_fd_into(fd, buf)):
+            i = col_idx.get(name)
+            if i is not None:
+                row[i] = total
+    except Exception:
+        pass
+
+
+def read_proc_softirqs(fd: Optional[int] = None,
+                       buf: Optional[bytearray] = None) -> dict:
+    """Parse /proc/softirqs -> {type: total_count_across_cpus}.
+
+    NOT CALLED IN MAIN LOOP — retained for ad-hoc use only.
+    Softirq rows (SCHED, RCU, TIMER, NET_RX, BLOCK) are OS scheduling noise
+    that is not used in the HAT analysis and not worth the polling overhead.
+    Types: HI, TIMER, NET_TX, NET_RX, BLOCK, TASKLET, SCHED, HRTIMER, RCU.
+    """
+    return _read_per_cpu_table("/proc/softirqs", fd, buf)
+
+
+CPUFREQ_ROOT = "/sys/devices/system/cpu"
+
+
+def open_cpu_freq_fds() -> List[Tuple[str, int]]:
+    """Open every cpu<N>/cpufreq/scaling_cur_freq once -> [(column, fd)].
+
+    The CPU set is fixed for the collector's lifetime, so the directory is
+    scanned once here instead of globbing the cpu* tree every sample.
+    """
+    fds = []
+    with os.scandir(CPUFREQ_ROOT) as it:
+        names = [e.name for e in it
+                 if e.name.startswith("cpu") and e.name[3:].isdigit()]
+    for name in sorted(names, key=lambda n: int(n[3:])):
+        try:
+            fd = os.open(f"{CPUFREQ_ROOT}/{name}/cpufreq/scaling_cur_freq",
+                         os.O_RDONLY)
+        except OSError:
+            continue   # no cpufreq driver / offline CPU
+        fds.append((f"{name}_freq_khz", fd))
+    return fds
+
+
+def read_cpu_frequencies(freq_fds: Optional[List[Tuple[str, int]]] = None) -> dict:
+    """Read per-core CPU frequency from sysfs (kHz).
+
+    With freq_fds from open_cpu_freq_fds() each value is a single pread();
+    int() accepts the trailing newline, so no str/strip round-trip.
+    """
+    try:
+        if freq_fds is not None:
+            return {col: int(os.pread(fd, 32, 0)) for col, fd in freq_fds}
+        import glob
+        data = {}
+        freq_files = glob.glob("/sys/devices/system/cpu/cpu*/cpufreq/scaling_cur_freq")
+        for fpath in sorted(freq_files):
+            cpu_num = fpath.split("/cpu")[1].split("/")[0]
+            with open(fpath, "rb") as f:
+                data[f"cpu{cpu_num}_freq_khz"] = int(f.read())
+        return data
+    except Exception:
+        return {}
+
+
+def read_cpu_frequencies_into(freq_cols: List[Tuple[int, int]], row: list) -> None:
+    """Write each CPU's frequency (kHz) into row[i] for (fd, i) in freq_cols.
+
+    Sampling-loop variant of read_cpu_frequencies(); fds come from
+    open_cpu_freq_fds().
+    """
+    try:
+        for fd, i in freq_cols:
+            row[i] = int(os.pread(fd, 32, 0))
+    except Exception:
+        pass
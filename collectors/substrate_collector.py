@@ -39,15 +39,20 @@ The HAT (§4.2.2 of the thesis) comprises two layers:
     hat_NMI, hat_PMI  — Performance Counter Overflow; counts perf's own activity
 
 Three collection mechanisms:
-  1. perf stat -a -I 1ms  (system-wide, 1ms buckets)
-  2. /proc/interrupts + /sys/cpufreq polling (100ms) — HAT L1 named interrupts only
-  3. journalctl -k slice  (post-trial, full window)
+  1. perf stat -a -I 1ms  (system-wide, 1ms buckets; optional -p <pid> run)
+  2. /proc/interrupts + /sys/cpufreq polling (97ms) — HAT L1 named interrupts only
+     (runs in a forked sampler process, GC disabled)
+  3. /dev/kmsg stream  (whole window; post-trial journalctl -k fallback)
 
 Outputs:
   perf_stat.txt       — raw perf stat output
   perf_stat.csv       — wide-format (1 row/ms, 1 col/event)
-  proc_sample.csv     — per-process CPU + RSS (100ms)
-  hat_interrupts.csv  — /proc/interrupts named rows + CPU freq (100ms)
+  pid_perf_stat.csv   — per-process perf stat -p <pid>, same layout (--pid_perf)
+  proc_sample.csv     — per-process CPU + RSS (97ms); pid is in collector_meta.json
+                        (or proc_sample.bin, int64 columns, with --proc_format bin)
+  hat_interrupts.csv  — /proc/interrupts named rows + CPU freq (97ms)
+                        (or hat_interrupts.bin / hat_interrupts_sparse.csv,
+                         with --hat_format bin / sparse)
                         NOTE: /proc/softirqs no longer included
   kernel_log.txt      — dmesg slice (MCE, thermal, hardware errors)
   collector_meta.json — configuration + timestamps
@@ -55,166 +60,316 @@ Outputs:
 
 import argparse
 import csv
+import gc
+import io
 import json
+import math
+import multiprocessing
+import multiprocessing.connection
 import os
 import signal
 import subprocess
+import sys
+import threading
 import time
+from array import array
 from dataclasses import dataclass
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Set
+
+from proc_sampler import (
+    open_proc_fd,
+    read_proc_stat_cpu,
+    PROC_STAT_FIRST_LINE_BYTES,
+    read_proc_pid_stat,
+    PID_STAT_BUF_BYTES,
+    pid_exists,
+    open_pidfd,
+    pidfd_exited,
+    read_proc_interrupts,
+    read_proc_interrupts_into,
+    PROC_TABLE_BUF_BYTES,
+    open_cpu_freq_fds,
+    read_cpu_frequencies_into,
+    parse_cpu_list,
+    read_isolated_cpus,
+)
+
+
+# Fill value for absent readings in hat_interrupts.bin (counts are >= 0)
+HAT_BIN_MISSING = -1
+
+HAT_OUT_NAMES = {
+    "csv": "hat_interrupts.csv",
+    "bin": "hat_interrupts.bin",
+    "sparse": "hat_interrupts_sparse.csv",
+}
+# hat_interrupts_sparse.csv: one row per sample, "changes" is a space-
+# separated list of <col_idx>:<value> (indices into the column list in
+# collector_meta.json).  Counters carry the delta since the previous
+# sample (the first sample's delta is from 0, i.e. the raw count);
+# *_freq_khz gauges carry the new reading.  Unchanged columns are omitted,
+# so idle IRQs cost nothing.
+HAT_SPARSE_HEADER = ("timestamp_ns", "changes")
+
+# Sampler process: nice level (needs CAP_SYS_NICE) and explicit GC cadence
+SAMPLER_NICE = -10
+GC_INTERVAL_NS = 60 * 10**9
+
+# Upper bound on rows held in memory before a writerows() call (see
+# sampling loop); also the growth step for preallocated binary columns
+ROW_BATCH = 64
+
+# --ready_fd: longest wait for perf's first interval line before reporting
+# ready anyway (perf still starting, or stuck on sudo/PMU setup)
+READY_TIMEOUT_S = 10.0
+
+# Explicit userspace buffer for output files written during collection, so
+# writes coalesce into large block-aligned chunks regardless of whether the
+# default would pick a small (or tty line-) buffer.
+OUT_BUFFER_BYTES = 1 << 20
+
+
+def out_buffer_size(out_dir: str) -> int:
+    """OUT_BUFFER_BYTES rounded down to a multiple of the fs block size."""
+    try:
+        blk = os.statvfs(out_dir).f_bsize or io.DEFAULT_BUFFER_SIZE
+    except OSError:
+        blk = io.DEFAULT_BUFFER_SIZE
+    return max(1, OUT_BUFFER_BYTES // blk) * blk
 
 
 # ─────────────────────────────────────────────────────────
-# /proc sampling
+# perf + kernel log
 # ─────────────────────────────────────────────────────────
 
-def read_proc_stat_cpu() -> Tuple[int, int]:
-    """Return (total_jiffies, idle_jiffies) from /proc/stat."""
-    with open("/proc/stat", "r", encoding="utf-8") as f:
-        first = f.readline().strip()
-
-    parts = first.split()
-    if not parts or parts[0] != "cpu":
-        raise RuntimeError("Unexpected /proc/stat format (first line not 'cpu ...')")
-
-    values = list(map(int, parts[1:]))
-    total = sum(values)
-
-    idle = values[3]
-    if len(values) > 4:
-        idle += values[4]
-
-    return total, idle
-
-
-def read_proc_pid_stat(pid: int) -> Tuple[int, int, int]:
-    """Return (utime, stime, rss_pages) for a given PID."""
-    path = f"/proc/{pid}/stat"
-    with open(path, "r", encoding="utf-8") as f:
-        s = f.read().strip()
-
-    rparen = s.rfind(")")
-    if rparen == -1:
-        raise RuntimeError(f"Unexpected format in {path}: missing ')'")
-    after = s[rparen + 2:]  # skip ") "
-    fields = after.split()
+@dataclass
+class PerfPlan:
+    interval_ms: int
+    events: List[str]
+    json_output: bool = False   # perf stat -j (perf >= 6.0) instead of -x ,
+    groups: Tuple[Tuple[str, ...], ...] = ()   # scheduled as '{a,b,...}'
+
+    def event_spec(self) -> str:
+        # Members of a group are emitted together, in braces, at the
+        # position of the group's first event; events in no group (or
+        # whose group is not fully present) stay free-standing.
+        present = set(self.events)
+        group_of = {}
+        for g in self.groups:
+            if g and all(e in present for e in g):
+                for e in g:
+                    group_of[e] = g
+        out: List[str] = []
+        for e in self.events:
+            g = group_of.get(e)
+            if g is None:
+                out.append(e)
+            elif e == g[0]:
+                out.append("{" + ",".join(g) + "}")
+        return ",".join(out)
+
+    def command(self, duration_s: float, out_path: Optional[str], cpu: str = "",
+                pid: int = 0) -> List[str]:
+        # If a CPU is specified, pin perf to that core via taskset.
+        # perf -a still counts system-wide; taskset only pins the perf
+        # *process itself* (its own scheduling + cache footprint).
+        # With a pid, perf counts only that process (-p) for the sleep window.
+        # Without out_path, interval output goes to stdout (--log-fd 1) so
+        # the collector can parse it while perf runs.
+        prefix = ["taskset", "-c", cpu] if cpu else []
+        target = ["-p", str(pid)] if pid else ["-a"]
+        output = ["-o", out_path] if out_path else ["--log-fd", "1"]
+        fmt = ["-j"] if self.json_output else ["-x", ","]
+        return prefix + [
+            "sudo", "-n", "perf", "stat",
+            *target,
+            *fmt,
+            "-I", str(self.interval_ms),
+            "-e", self.event_spec(),
+            *output,
+            "--",
+            "sleep", str(duration_s),
+        ]
 
-    utime = int(fields[11])
-    stime = int(fields[12])
-    rss_pages = int(fields[21])
 
-    return utime, stime, rss_pages
+# Per-process counters for the optional --pid_perf run (perf stat -p <pid>).
+# Software events only, so they never compete with the system-wide run for
+# PMU counters.
+PID_PERF_EVENTS = [
+    "task-clock",
+    "context-switches",
+    "cpu-migrations",
+    "page-faults",
+]
 
 
-def pid_exists(pid: int) -> bool:
-    return os.path.exists(f"/proc/{pid}")
+def _stop_perf(perf_proc: subprocess.Popen, interrupt: bool, timeout_s: float) -> None:
+    """Wait for a perf stat process, interrupting it first if requested.
 
+    SIGINT makes perf flush its -o output; SIGTERM may cause it to exit
+    without writing the file.
+    """
+    if interrupt:
+        try:
+            os.killpg(perf_proc.pid, signal.SIGINT)
+        except (ProcessLookupError, PermissionError):
+            perf_proc.terminate()
+    try:
+        perf_proc.wait(timeout=timeout_s)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(perf_proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            perf_proc.kill()
+        perf_proc.wait(timeout=5.0)
 
-# ─────────────────────────────────────────────────────────
-# HAT-relevant /proc and /sys reads
-# ─────────────────────────────────────────────────────────
 
-def read_proc_interrupts() -> dict:
-    """Parse /proc/interrupts -> {irq_name: total_count_across_cpus}.
+def _await_sampler(result_recv, sampler, perf_proc: subprocess.Popen
+                   ) -> Tuple[dict, bool]:
+    """Wait for the sampler's result, stopping it early if perf fails.
 
-    Key HAT rows: SPU (spurious), NMI, PMI (perf counter overflow),
-    MCE (machine check), TLB (shootdown), LOC (local APIC timer),
-    RES (rescheduling IPI), CAL (function call IPI).
+    If perf exits non-zero first (e.g. the kernel refused an event) the rest
+    of the window would only produce /proc data with no perf counterpart,
+    so the sampler is sent SIGTERM and wraps up immediately.  perf is
+    watched through a pidfd when available (no polling), else every 0.5 s.
+    Returns (sampler result dict, perf_failed).
     """
+    perf_pidfd = open_pidfd(perf_proc.pid)
+    watch = [result_recv] + ([perf_pidfd] if perf_pidfd is not None else [])
+    perf_failed = False
     try:
-        with open("/proc/interrupts", "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        data = {}
-        for line in lines[1:]:
-            parts = line.split()
-            if not parts:
-                continue
-            irq_name = parts[0].rstrip(":")
-            counts = [int(x) for x in parts[1:] if x.isdigit()]
-            data[irq_name] = sum(counts)
-        return data
-    except Exception:
-        return {}
+        while True:
+            watching_perf = perf_proc.returncode is None
+            timeout = None if perf_pidfd is not None or not watching_perf else 0.5
+            ready = multiprocessing.connection.wait(watch, timeout=timeout)
+            if result_recv in ready:
+                break
+            if watching_perf and perf_proc.poll() is not None:
+                if perf_proc.returncode != 0:
+                    perf_failed = True
+                    print(f"  ⚠ perf stat exited early (code {perf_proc.returncode})"
+                          " — stopping the sampler")
+                    try:
+                        os.kill(sampler.pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                watch = [result_recv]
+        return result_recv.recv(), perf_failed
+    except EOFError:      # sampler died before reporting
+        return {}, perf_failed
+    finally:
+        if perf_pidfd is not None:
+            os.close(perf_pidfd)
+
+
+def _format_kmsg_record(rec: bytes) -> Tuple[int, bytes]:
+    """Split one /dev/kmsg record into (ts_us, dmesg-style line(s)).
+
+    Record format: "prio,seq,ts_us,flags;message\n[ KEY=value\n...]" with
+    ts_us on the kernel's monotonic clock.
+    """
+    header, _, body = rec.partition(b";")
+    ts_us = int(header.split(b",", 3)[2])
+    return ts_us, b"[%5d.%06d] %s" % (ts_us // 1_000_000, ts_us % 1_000_000, body)
 
 
-def read_proc_softirqs() -> dict:
-    """Parse /proc/softirqs -> {type: total_count_across_cpus}.
+def _read_kmsg_slice(out_fd: int, t_start_us: int, t_end_us: int) -> int:
+    """Copy /dev/kmsg records stamped within [t_start_us, t_end_us] to out_fd.
 
-    NOT CALLED IN MAIN LOOP — retained for ad-hoc use only.
-    Softirq rows (SCHED, RCU, TIMER, NET_RX, BLOCK) are OS scheduling noise
-    that is not used in the HAT analysis and not worth the polling overhead.
-    Types: HI, TIMER, NET_TX, NET_RX, BLOCK, TASKLET, SCHED, HRTIMER, RCU.
+    Each read() on /dev/kmsg returns exactly one record.  Records are in
+    timestamp order, so the read stops at the first one past the window (or
+    when the buffer is drained).  Returns the number of records written.
     """
+    fd = os.open("/dev/kmsg", os.O_RDONLY | os.O_NONBLOCK)
+    n = 0
     try:
-        with open("/proc/softirqs", "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        data = {}
-        for line in lines[1:]:
-            parts = line.split()
-            if not parts:
+        while True:
+            try:
+                rec = os.read(fd, 8192)
+            except BlockingIOError:
+                break               # caught up with the ring buffer
+            except BrokenPipeError:
+                continue            # record overwritten while reading; skip
+            ts_us, line = _format_kmsg_record(rec)
+            if ts_us < t_start_us:
                 continue
-            sirq_name = parts[0].rstrip(":")
-            counts = [int(x) for x in parts[1:] if x.isdigit()]
-            data[sirq_name] = sum(counts)
-        return data
-    except Exception:
-        return {}
+            if ts_us > t_end_us:
+                break
+            os.write(out_fd, line)
+            n += 1
+    finally:
+        os.close(fd)
+    return n
 
 
-def read_cpu_frequencies() -> dict:
-    """Read per-core CPU frequency from sysfs (kHz)."""
+def open_kmsg_stream() -> Optional[int]:
+    """Open /dev/kmsg positioned at its end, or None if it is not readable."""
     try:
-        import glob
-        data = {}
-        freq_files = glob.glob("/sys/devices/system/cpu/cpu*/cpufreq/scaling_cur_freq")
-        for fpath in sorted(freq_files):
-            cpu_num = fpath.split("/cpu")[1].split("/")[0]
-            with open(fpath, "r", encoding="utf-8") as f:
-                freq_khz = int(f.read().strip())
-                data[f"cpu{cpu_num}_freq_khz"] = freq_khz
-        return data
-    except Exception:
-        return {}
+        fd = os.open("/dev/kmsg", os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None
+    os.lseek(fd, 0, os.SEEK_END)
+    return fd
 
 
-# ─────────────────────────────────────────────────────────
-# perf + kernel log
-# ─────────────────────────────────────────────────────────
+def stream_kmsg_to(kmsg_fd: int, out_path: str, stop: threading.Event) -> None:
+    """Thread body: append kernel messages to out_path as they are logged.
 
-@dataclass
-class PerfPlan:
-    interval_ms: int
-    events: List[str]
+    Runs from t0 for the whole collection window, so kernel_log.txt is
+    complete as soon as the window closes (no serial post-trial capture).
+    """
+    out_fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while True:
+            stopping = stop.wait(0.2)
+            while True:
+                try:
+                    rec = os.read(kmsg_fd, 8192)
+                except BlockingIOError:
+                    break
+                except BrokenPipeError:
+                    continue
+                os.write(out_fd, _format_kmsg_record(rec)[1])
+            if stopping:
+                break
+    finally:
+        os.close(out_fd)
+        os.close(kmsg_fd)
 
-    def command(self, duration_s: float, out_path: str, cpu: str = "") -> List[str]:
-        # If a CPU is specified, pin perf to that core via taskset.
-        # perf -a still counts system-wide; taskset only pins the perf
-        # *process itself* (its own scheduling + cache footprint).
-        prefix = ["taskset", "-c", cpu] if cpu else []
-        return prefix + [
-            "sudo", "-n", "perf", "stat",
-            "-a",
-            "-x", ",",
-            "-I", str(self.interval_ms),
-            "-e", ",".join(self.events),
-            "-o", out_path,
-            "--",
-            "sleep", str(duration_s),
-        ]
+
+# Upper bound on journalctl fallback output (newest entries win); a trial
+# window never has this many kernel lines unless something is flooding.
+JOURNALCTL_MAX_LINES = 100000
 
 
-def write_kernel_log_slice(out_path: str, t_start_epoch: float, t_end_epoch: float) -> None:
+def write_kernel_log_slice(out_path: str, t_start_epoch: float, t_end_epoch: float,
+                           t_start_mono: float, t_end_mono: float,
+                           use_kmsg: bool = True) -> None:
     """Dump kernel log (dmesg) for the collection window.
 
     Captures MCE records, thermal events, and other hardware errors --
     these are HAT Layer 1 anomalies that don't always generate perf events.
+
+    Reads /dev/kmsg directly (filtered on the monotonic window), which skips
+    the journalctl fork and full journal scan.  Falls back to journalctl
+    (epoch window) when /dev/kmsg is not readable, e.g. dmesg_restrict=1
+    without CAP_SYSLOG, or always with use_kmsg=False (--klog_source
+    journalctl).
     """
+    if use_kmsg:
+        out_fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            _read_kmsg_slice(out_fd, int(t_start_mono * 1e6), int(t_end_mono * 1e6))
+            return
+        except OSError:
+            os.ftruncate(out_fd, 0)
+        finally:
+            os.close(out_fd)
+
     since_arg = f"@{t_start_epoch:.3f}"
     until_arg = f"@{t_end_epoch:.3f}"
     cmd = ["sudo", "-n", "journalctl", "-k", "--since", since_arg,
-           "--until", until_arg, "--no-pager"]
+           "--until", until_arg, "-n", str(JOURNALCTL_MAX_LINES), "--no-pager"]
     try:
         out = subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
@@ -225,6 +380,375 @@ def write_kernel_log_slice(out_path: str, t_start_epoch: float, t_end_epoch: flo
         f.write(out)
 
 
+# uint32 microseconds since t0_ns covers runs up to ~71 min
+_TS_DELTA_MAX_S = (2 ** 32 - 1) / 1e6
+# The deltas are taken from the collector's t0_ns, not the sampler's own
+# start, so they also carry collector startup (perf launch, sampler fork)
+# and the last tick's overrun past duration_s.  Headroom for both.
+_TS_DELTA_SLACK_S = 60.0
+
+
+def write_columnar_bin(out_path: str, columns: List[array]) -> None:
+    """Write equal-length columns back to back (struct-of-arrays).
+
+    Column names, per-column dtypes, byte order and row count are recorded
+    in collector_meta.json under "proc_sample_bin".  The timestamp column is
+    delta-encoded as uint32 µs since t0_ns when the run fits, so a reader
+    does e.g.  ts = np.fromfile(path, "u4", rows)  and the int64 columns
+    from offset 4*rows onwards.
+    """
+    with open(out_path, "wb") as f:
+        for col in columns:
+            col.tofile(f)
+
+
+# proc_sample columns.  The target pid is constant for the run and recorded
+# in collector_meta.json, so it is not repeated on every row.
+# expected_ts_ns is the sample's scheduled slot (t0 + k * interval); a gap
+# or a timestamp_ns far past it marks a late or dropped tick.
+PROC_HEADER = (
+    "timestamp_ns",
+    "expected_ts_ns",
+    "cpu_total_jiffies",
+    "cpu_idle_jiffies",
+    "proc_utime_jiffies",
+    "proc_stime_jiffies",
+    "proc_rss_pages",
+)
+
+
+def proc_bin_layout(proc_header: List[str], duration_s: float
+                    ) -> Tuple[List[str], List[str], List[str]]:
+    """Return (columns, dtypes, array typecodes) for proc_sample.bin.
+
+    Both timestamp columns are delta-encoded against t0_ns as uint32 µs
+    unless the run (plus startup slack) is too long for that; every other
+    column is int64.
+    """
+    columns = list(proc_header)
+    dtypes = ["int64"] * len(columns)
+    typecodes = ["q"] * len(columns)
+    if duration_s + _TS_DELTA_SLACK_S < _TS_DELTA_MAX_S:
+        columns[0] = "t_us_since_t0"
+        columns[1] = "expected_t_us_since_t0"
+        dtypes[0] = dtypes[1] = "uint32"
+        typecodes[0] = typecodes[1] = "I"
+    return columns, dtypes, typecodes
+
+
+def build_hat_header(irq_names, freq_names: List[str]) -> Tuple[str, ...]:
+    """Canonical hat_interrupts column order for a run.
+
+    timestamp_ns, numbered IRQs in numeric order, named IRQs (LOC, NMI,
+    TLB, ...) alphabetically, then cpu<N>_freq_khz in CPU order as given.
+    """
+    numbered = sorted((n for n in irq_names if n.isdigit()), key=int)
+    named = sorted(n for n in irq_names if not n.isdigit())
+    return ("timestamp_ns", *numbered, *named, *freq_names)
+
+
+def sparse_hat_changes(row: list, prev: list, is_gauge: List[bool]) -> str:
+    """Encode one hat row against prev (updated in place) as sparse changes.
+
+    Columns absent from this sample ("") are skipped and keep their
+    previous value.
+    """
+    parts = []
+    for i in range(1, len(row)):
+        v = row[i]
+        if v == "" or v == prev[i]:
+            continue
+        parts.append(f"{i}:{v if is_gauge[i] else v - prev[i]}")
+        prev[i] = v
+    return " ".join(parts)
+
+
+def sampler_entry(pid: int, duration_s: float, proc_interval_s: float,
+                  flush_interval_s: float, proc_out: str, proc_bin: bool,
+                  hat_irq_out: str, hat_format: str, t0_ns: int, result_conn,
+                  fsync: bool = False,
+                  cpus: Optional[Set[int]] = None,
+                  inherited_fds: Tuple[int, ...] = ()) -> None:
+    """/proc + /sys sampling loop, run in its own (forked) process.
+
+    Isolated from the collector's main process so that its perf/kmsg reader
+    threads, JSON writes and any GC pauses there cannot delay samples.  GC
+    is disabled here: the loop allocates no reference cycles.  Row counts
+    and the hat_interrupts column list are sent back over result_conn (a
+    multiprocessing Pipe end) for collector_meta.json.  With fsync=True
+    every CSV flush window is also fsync()ed, so a crash loses at most one
+    window of rows.
+
+    With cpus set the sampler pins itself there (the perf core, off the
+    LLM's CPUs) and asks for a higher scheduling priority.
+
+    inherited_fds are parent-side fds (kmsg stream, runner ready pipe) that
+    the fork copied in; they are closed first so the child never keeps them
+    open on the parent's behalf.
+    """
+    for fd in inherited_fds:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+    gc.disable()
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, SAMPLER_NICE)
+    except PermissionError:
+        pass   # unprivileged: keep the default nice level
+
+    proc_header = list(PROC_HEADER)
+    _, _, proc_typecodes = proc_bin_layout(proc_header, duration_s)
+    # Columns are preallocated for the whole run -- at most one sample per
+    # interval fits in the window -- and filled by index, so the hot loop
+    # never grows an array; unused tail rows are dropped at the end.
+    proc_cap = math.ceil(duration_s / proc_interval_s) + 1
+    proc_cols = ([array(tc, bytes(array(tc).itemsize * proc_cap))
+                  for tc in proc_typecodes] if proc_bin else [])
+    n_proc_rows = 0
+
+    # Build the HAT interrupt header: IRQ names from one read of
+    # /proc/interrupts, frequency columns straight from the cpufreq files
+    # found at startup (no priming read of their values).
+    # /proc/softirqs intentionally excluded — OS scheduling noise, not HAT-relevant
+    sample_interrupts = read_proc_interrupts()
+    freq_fds          = open_cpu_freq_fds()
+
+    # Column order is fixed here, once, for the whole run.  An interrupt
+    # source that first appears mid-run (e.g. a device IRQ registered after
+    # this sample) has no column and is dropped; on a stable kernel the
+    # /proc/interrupts row set does not change during a trial.
+    hat_header = build_hat_header(sample_interrupts,
+                                  [name for name, _ in freq_fds])
+
+    # Readers write straight into a row by column index (no per-tick dicts).
+    # Columns missing from a sample stay "" (CSV) / HAT_BIN_MISSING (bin)
+    # as in the template row.
+    col_idx = {name: i for i, name in enumerate(hat_header)}
+    irq_idx = {name.encode(): col_idx[name] for name in sample_interrupts}
+    freq_cols = [(fd, col_idx[name]) for name, fd in freq_fds
+                 if name in col_idx]
+    hat_bin = hat_format == "bin"
+    hat_sparse = hat_format == "sparse"
+    hat_blank = [HAT_BIN_MISSING if hat_bin else ""] * len(hat_header)
+    hat_gauge = [name.endswith("_freq_khz") for name in hat_header]
+    hat_prev = [None if g else 0 for g in hat_gauge]
+
+    # One monotonic_ns() read per iteration drives the stop check, the
+    # flush check and the row timestamp; wall-clock time is reconstructed
+    # from a single (wall, mono) pair taken here, so it cannot step mid-run.
+    t0_wall_ns = time.time_ns()
+    t0_mono_ns = time.monotonic_ns()
+    duration_ns = int(duration_s * 1e9)
+    interval_ns = int(proc_interval_s * 1e9)
+    # Flush window in rows: one flush_interval_s worth of samples (the loop
+    # runs on an absolute-deadline schedule, so rows track elapsed time),
+    # capped at ROW_BATCH.
+    row_batch = max(1, min(ROW_BATCH, int(flush_interval_s / proc_interval_s)))
+
+    # SIGTERM (forwarded by the parent collector) ends the loop gracefully
+    stop_requested = False
+
+    def _handle_sigterm(signum, frame):
+        nonlocal stop_requested
+        stop_requested = True
+
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
+    # -- Sampling loop --
+    # /proc/stat and /proc/<pid>/stat are opened once and re-read via pread.
+    stat_fd = open_proc_fd("/proc/stat")
+    stat_buf = bytearray(PROC_STAT_FIRST_LINE_BYTES)
+    pid_fd  = open_proc_fd(f"/proc/{pid}/stat")
+    pid_buf = bytearray(PID_STAT_BUF_BYTES)
+    # Liveness via pidfd (one poll, no path lookup); kill(pid, 0) as fallback
+    pidfd   = open_pidfd(pid)
+    # /proc/interrupts is several KB per row set on many-core hosts; keep
+    # the fd and the read buffer for the whole run as well.
+    irq_fd  = open_proc_fd("/proc/interrupts")
+    irq_buf = bytearray(PROC_TABLE_BUF_BYTES)
+
+    # proc_sample.csv has a fixed all-integer schema, so rows are formatted
+    # with bytes %-formatting (C fast path) into a bytearray and written with
+    # os.write() per flush window -- no csv.writer dialect/quoting work.
+    proc_fd = (None if proc_bin else
+               os.open(proc_out, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+    proc_buf = bytearray()
+    proc_row_fmt = b",".join([b"%d"] * len(proc_header)) + b"\n"
+    if proc_fd is not None:
+        os.write(proc_fd, (",".join(proc_header) + "\n").encode())
+
+    # hat_interrupts.bin (--hat_format bin) keeps one int64 array per column
+    # in memory and is written once at the end, like proc_sample.bin.  The
+    # columns are preallocated (and so faulted in) for the whole window
+    # before sampling starts, like proc_cols: flushes assign into them by
+    # slice instead of growing them mid-measurement.
+    f_hat = (None if hat_bin else
+             open(hat_irq_out, "w", newline="", encoding="utf-8",
+                  buffering=out_buffer_size(os.path.dirname(hat_irq_out))))
+    hat_cols = ([array("q", bytes(8 * proc_cap)) for _ in hat_header]
+                if hat_bin else [])
+    hat_cap = proc_cap
+    n_hat_rows = 0
+
+    try:
+        if f_hat is not None:
+            w_hat = csv.writer(f_hat)
+            w_hat.writerow(HAT_SPARSE_HEADER if hat_sparse else hat_header)
+
+        # No per-row flush: each flush is a write() syscall inside the
+        # sampling window, adding jitter to the timestamps being recorded.
+        # Rows are accumulated in memory and written once per flush window
+        # (every row_batch rows).
+        hat_batch: list = []
+        last_gc = t0_mono_ns
+
+        # Absolute-deadline cadence: sample k is due at t_first + k*interval,
+        # so time spent reading /proc and writing rows does not accumulate
+        # as drift (a plain sleep(interval) after the work would).
+        deadline = t0_mono_ns
+
+        def _flush_batches() -> None:
+            nonlocal hat_cap, n_hat_rows
+            if proc_buf:
+                os.write(proc_fd, proc_buf)
+                proc_buf.clear()
+            if f_hat is None:
+                # Binary: transpose the window into the per-column arrays
+                end = n_hat_rows + len(hat_batch)
+                if end > hat_cap:   # defensive; cap covers the window
+                    grow = max(end - hat_cap, ROW_BATCH)
+                    for col in hat_cols:
+                        col.frombytes(bytes(8 * grow))
+                    hat_cap += grow
+                for col, vals in zip(hat_cols, zip(*hat_batch)):
+                    col[n_hat_rows:end] = array("q", vals)
+                n_hat_rows = end
+            else:
+                # Left in f_hat's block-sized buffer: it reaches the file
+                # when the buffer fills (or at close), not every window.
+                w_hat.writerows(hat_batch)
+            hat_batch.clear()
+            if fsync:
+                if proc_fd is not None:
+                    os.fsync(proc_fd)
+                if f_hat is not None:
+                    f_hat.flush()
+                    os.fsync(f_hat.fileno())
+
+        while not stop_requested:
+            now = time.monotonic_ns()
+            if now - t0_mono_ns >= duration_ns:
+                break
+            # With a pidfd, exit is detected by the sleep at the bottom
+            if pidfd is None and not pid_exists(pid):
+                break
+
+            ts = t0_wall_ns + (now - t0_mono_ns)
+            expected_ts = t0_wall_ns + (deadline - t0_mono_ns)
+
+            # Process + system CPU
+            cpu_total, cpu_idle = read_proc_stat_cpu(stat_fd, stat_buf)
+            try:
+                utime, stime, rss_pages = read_proc_pid_stat(pid_fd, pid_buf)
+            except ProcessLookupError:
+                break   # pid exited since the last check; the fd is stale
+            if proc_bin:
+                if n_proc_rows == proc_cap:   # defensive; cap covers the window
+                    for col in proc_cols:
+                        col.frombytes(bytes(col.itemsize * ROW_BATCH))
+                    proc_cap += ROW_BATCH
+                if proc_typecodes[0] == "I":
+                    proc_cols[0][n_proc_rows] = max(0, ts - t0_ns) // 1000
+                    proc_cols[1][n_proc_rows] = max(0, expected_ts - t0_ns) // 1000
+                else:
+                    proc_cols[0][n_proc_rows] = ts
+                    proc_cols[1][n_proc_rows] = expected_ts
+                for col, val in zip(proc_cols[2:], (cpu_total, cpu_idle,
+                                                    utime, stime, rss_pages)):
+                    col[n_proc_rows] = val
+            else:
+                proc_buf += proc_row_fmt % (ts, expected_ts, cpu_total,
+                                            cpu_idle, utime, stime,
+                                            rss_pages)
+            n_proc_rows += 1
+
+            # HAT interrupt counts + CPU frequency
+            # /proc/softirqs intentionally not polled (OS noise, not HAT-relevant)
+            hat_row = hat_blank.copy()
+            hat_row[0] = ts
+            read_proc_interrupts_into(irq_fd, irq_buf, hat_row, irq_idx)
+            read_cpu_frequencies_into(freq_cols, hat_row)
+            if hat_sparse:
+                hat_batch.append((ts, sparse_hat_changes(hat_row, hat_prev,
+                                                         hat_gauge)))
+            else:
+                hat_batch.append(hat_row)
+
+            if len(hat_batch) >= row_batch:
+                _flush_batches()
+                # GC is off; collect at most once a minute, right after a
+                # flush, so any pause lands at a known point in the run.
+                if now - last_gc >= GC_INTERVAL_NS:
+                    gc.collect()
+                    last_gc = time.monotonic_ns()
+
+            deadline += interval_ns
+            slack_s = max(0, deadline - time.monotonic_ns()) / 1e9
+            if pidfd is not None:
+                if pidfd_exited(pidfd, slack_s):
+                    break
+            elif slack_s > 0:
+                time.sleep(slack_s)
+
+        # Residual rows from the last (partial) flush window
+        _flush_batches()
+    finally:
+        os.close(stat_fd)
+        os.close(pid_fd)
+        os.close(irq_fd)
+        for _, fd in freq_fds:
+            os.close(fd)
+        if pidfd is not None:
+            os.close(pidfd)
+        if proc_fd is not None:
+            os.close(proc_fd)
+        if f_hat is not None:
+            f_hat.close()
+
+    if proc_bin:
+        for col in proc_cols:
+            del col[n_proc_rows:]
+        write_columnar_bin(proc_out, proc_cols)
+    if hat_bin:
+        for col in hat_cols:
+            del col[n_hat_rows:]
+        write_columnar_bin(hat_irq_out, hat_cols)
+    result_conn.send({
+        "proc_rows": n_proc_rows,
+        "hat_columns": hat_header,
+        "hat_rows": n_hat_rows if hat_bin else None,
+    })
+    result_conn.close()
+
+
+def pick_isolate_cpu(spec: str) -> int:
+    """Resolve --isolate_cpu ('auto' or a CPU number) to a CPU we may run on."""
+    allowed = os.sched_getaffinity(0)
+    if spec.strip().lower() == "auto":
+        isolated = read_isolated_cpus()
+        return min(isolated) if isolated else max(allowed)
+    try:
+        cpu = int(spec)
+    except ValueError:
+        raise SystemExit(f"--isolate_cpu must be a CPU number or 'auto', got {spec!r}")
+    if cpu not in allowed and cpu not in read_isolated_cpus():
+        raise SystemExit(f"--isolate_cpu {cpu} is not an available CPU")
+    return cpu
+
+
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
@@ -240,8 +764,53 @@ def fail_fast_sudo() -> None:
         )
 
 
+_TRACEFS_ROOTS = ("/sys/kernel/tracing", "/sys/kernel/debug/tracing")
+_PMU_ROOT = "/sys/bus/event_source/devices"
+
+
+def _probe_event_sysfs(event: str) -> Optional[bool]:
+    """Decide event availability from sysfs/tracefs, or None if unsure.
+
+    "subsys:name" tracepoints are looked up in tracefs (only conclusive
+    when tracefs is readable by us -- it is usually root-only).
+    "pmu/event/" is False when no such PMU exists (perf matches
+    uncore_imc against uncore_imc_*), True when the PMU exports the event
+    alias.  perf's JSON names (core_power.throttle, UNC_M_*) are not in
+    sysfs, so those stay inconclusive.
+    """
+    if ":" in event and "/" not in event:
+        subsys, _, name = event.partition(":")
+        for root in _TRACEFS_ROOTS:
+            if os.access(os.path.join(root, "events"), os.R_OK | os.X_OK):
+                return os.path.isdir(os.path.join(root, "events", subsys, name))
+        return None
+    if "/" in event:
+        pmu, _, rest = event.partition("/")
+        name = rest.strip("/")
+        try:
+            pmus = [d for d in os.listdir(_PMU_ROOT)
+                    if d == pmu or d.startswith(pmu + "_")]
+        except OSError:
+            return None
+        if not pmus:
+            return False
+        if "=" not in name and all(
+                os.path.exists(os.path.join(_PMU_ROOT, d, "events", name))
+                for d in pmus):
+            return True
+        return None
+    return None
+
+
 def _probe_event(event: str) -> bool:
-    """Return True if perf can open this event on the running kernel."""
+    """Return True if perf can open this event on the running kernel.
+
+    sysfs/tracefs is checked first; only inconclusive events pay for a
+    sudo perf stat fork/exec.
+    """
+    known = _probe_event_sysfs(event)
+    if known is not None:
+        return known
     try:
         subprocess.check_call(
             ["sudo", "-n", "perf", "stat", "-e", event, "--", "true"],
@@ -252,59 +821,127 @@ def _probe_event(event: str) -> bool:
         return False
 
 
-def _postprocess_perf_csv(raw_path: str, out_path: str) -> None:
-    """Convert perf stat -x ',' raw output into a clean wide-format CSV.
+def _parse_perf_line(line: str, rows_by_ts: dict, events_seen: dict) -> None:
+    """Parse one perf stat -x ',' -I line into rows_by_ts[ts][event] = value.
 
     Input:  timestamp,value,unit,event,runtime,pct_running,...
-    Output: t_s, event_1, event_2, ...
+    JSON records (perf stat -j) are detected by a leading "{" and handed
+    to _parse_perf_json_line().  events_seen is used as an insertion-ordered
+    set (keys only), so the per-line membership check is O(1).
     """
-    from collections import OrderedDict
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return
+    if line.startswith("{"):
+        _parse_perf_json_line(line, rows_by_ts, events_seen)
+        return
+    parts = line.split(",")
+    if len(parts) < 4:
+        return
+    ts_str = parts[0].strip()
+    val_str = parts[1].strip()
+    event = parts[3].strip()
+    if not event:
+        return
+    try:
+        ts = float(ts_str)
+    except ValueError:
+        return
+    if val_str.startswith("<") or val_str == "":
+        val = float("nan")
+    else:
+        try:
+            val = float(val_str)
+        except ValueError:
+            val = float("nan")
 
-    rows_by_ts: dict = OrderedDict()
-    events_seen: list = []
+    if event not in events_seen:
+        events_seen[event] = None
+    row = rows_by_ts.get(ts)
+    if row is None:
+        row = rows_by_ts[ts] = {}
+    row[event] = val
 
-    with open(raw_path, "r", encoding="utf-8", errors="replace") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split(",")
-            if len(parts) < 4:
-                continue
-            ts_str = parts[0].strip()
-            val_str = parts[1].strip()
-            event = parts[3].strip()
-            if not event:
-                continue
-            try:
-                ts = float(ts_str)
-            except ValueError:
-                continue
-            if val_str.startswith("<") or val_str == "":
-                val = float("nan")
-            else:
-                try:
-                    val = float(val_str)
-                except ValueError:
-                    val = float("nan")
 
-            if event not in events_seen:
-                events_seen.append(event)
-            if ts not in rows_by_ts:
-                rows_by_ts[ts] = {}
-            rows_by_ts[ts][event] = val
+def _parse_perf_json_line(line: str, rows_by_ts: dict, events_seen: dict) -> None:
+    """Parse one perf stat -j -I record (one JSON object per line).
 
+    Input:  {"interval" : 1.001, "counter-value" : "100.000000",
+             "unit" : "", "event" : "cycles", ...}
+    Fields are named, so an empty unit cannot shift columns as it can
+    with -x ','.
+    """
+    try:
+        rec = json.loads(line)
+        ts = float(rec["interval"])
+        event = rec["event"]
+    except (ValueError, KeyError, TypeError):
+        return
+    try:
+        val = float(rec.get("counter-value", ""))
+    except (ValueError, TypeError):      # "<not counted>", "<not supported>"
+        val = float("nan")
+
+    if event not in events_seen:
+        events_seen[event] = None
+    row = rows_by_ts.get(ts)
+    if row is None:
+        row = rows_by_ts[ts] = {}
+    row[event] = val
+
+
+def _write_perf_csv(rows_by_ts: dict, events_seen: dict, out_path: str) -> None:
+    """Write parsed perf intervals as a wide-format CSV (t_s, event_1, ...)."""
     with open(out_path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        header = ["t_s"] + events_seen
-        w.writerow(header)
-        for ts in rows_by_ts:
-            row = [ts]
-            for evt in events_seen:
-                row.append(rows_by_ts[ts].get(evt, ""))
-            w.writerow(row)
+        events = tuple(events_seen)
+        w.writerow(("t_s",) + events)
+        w.writerows([ts, *[vals.get(evt, "") for evt in events]]
+                    for ts, vals in rows_by_ts.items())
+
+    print(f"  {os.path.basename(out_path)}: "
+          f"{len(rows_by_ts)} rows x {len(events_seen)} events")
+
+
+def _stream_perf_output(pipe, raw_path: str, rows_by_ts: dict,
+                        events_seen: dict, buffering: int = -1,
+                        first_output: Optional[threading.Event] = None) -> None:
+    """Thread body: tee perf's --log-fd pipe to raw_path and parse each line.
+
+    Parsing while perf runs removes the post-run pass over the (large) raw
+    text file; the raw file is still written for reference / re-processing.
+    first_output, if given, is set once perf has printed its first line
+    (counters are live) or closed the pipe.
+    """
+    with open(raw_path, "wb", buffering=buffering) as raw:
+        line = pipe.readline()
+        if first_output is not None:
+            first_output.set()
+        if line:
+            raw.write(line)
+            _parse_perf_line(line.decode("utf-8", errors="replace"),
+                             rows_by_ts, events_seen)
+        for line in pipe:
+            raw.write(line)
+            _parse_perf_line(line.decode("utf-8", errors="replace"),
+                             rows_by_ts, events_seen)
+    pipe.close()
+
+
+def _postprocess_perf_csv(raw_path: str, out_path: str) -> None:
+    """Convert perf stat -x ',' raw output into a clean wide-format CSV.
+
+    Input:  timestamp,value,unit,event,runtime,pct_running,...
+    Output: t_s, event_1, event_2, ...
+    """
+    rows_by_ts: dict = {}
+    events_seen: dict = {}
+
+    with open(raw_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            _parse_perf_line(line, rows_by_ts, events_seen)
 
-    print(f"  perf_stat.csv: {len(rows_by_ts)} rows x {len(events_seen)} events")
+    _write_perf_csv(rows_by_ts, events_seen, out_path)
 
 
 def main() -> int:
@@ -318,15 +955,76 @@ def main() -> int:
     ap.add_argument("--duration_s", type=float, required=True,
                     help="Total wall-clock duration to collect.")
     ap.add_argument("--perf_interval_ms", type=int, default=1,
-                    help="perf stat bucket interval in ms (default: 1).")
-    ap.add_argument("--proc_interval_s", type=float, default=0.1,
-                    help="/proc sampling interval seconds (default: 0.1).")
+                    help="perf stat bucket interval in ms (default: 1, which "
+                         "burst_clustering/lz_complexity need).  Each bucket "
+                         "is one perf wakeup and one row per event, so use "
+                         "10+ for long runs that only need totals/rates.")
+    # 97 ms rather than 100: a period that is not a multiple of 10 ms does
+    # not lock-step with tick-, timer- or cron-driven activity, so periodic
+    # system work is not always caught (or always missed) by the sampler.
+    ap.add_argument("--proc_interval_s", type=float, default=0.097,
+                    help="/proc sampling interval seconds (default: 0.097).")
+    ap.add_argument("--proc_format", choices=("csv", "bin"), default="csv",
+                    help="Output format for the process sampler: 'csv' "
+                         "(proc_sample.csv) or 'bin' (proc_sample.bin, raw "
+                         "int64 columns, layout in collector_meta.json). "
+                         "See --hat_format for hat_interrupts.")
+    ap.add_argument("--hat_format", choices=("csv", "bin", "sparse"),
+                    default="csv",
+                    help="Output format for /proc/interrupts + CPU freq: "
+                         "'csv' (hat_interrupts.csv), 'bin' "
+                         "(hat_interrupts.bin, int64 columns) or 'sparse' "
+                         "(hat_interrupts_sparse.csv, changed columns only, "
+                         "counters as deltas).  csv and sparse are read by "
+                         "extract_features.py; layouts in collector_meta.json.")
+    ap.add_argument("--flush_interval_s", type=float, default=1.0,
+                    help="How often buffered sampler rows are written out "
+                         "(default: 1.0), as a row count derived from "
+                         "--proc_interval_s (at most 64 rows).  Rows are NOT "
+                         "written per sample; hat CSV rows then sit in a "
+                         "1 MiB file buffer unless --fsync is given.")
+    ap.add_argument("--fsync", action="store_true",
+                    help="fsync() the sampler CSVs at every flush window "
+                         "(crash durability; off by default since the "
+                         "files are only read after the run).")
+    ap.add_argument("--perf_json", action="store_true",
+                    help="Run perf stat with -j (JSON records, perf >= 6.0) "
+                         "instead of -x ','.  perf_stat.txt then holds one "
+                         "JSON object per line; perf_stat.csv is unchanged.")
+    ap.add_argument("--perf_groups", action="store_true",
+                    help="Schedule the core-PMU HAT counters as two perf "
+                         "event groups of four ({cycles,instructions,"
+                         "branch-*} and {cache-*,LLC-load-misses,"
+                         "dTLB-load-misses}) so they are not multiplexed "
+                         "individually.  Recorded as perf_groups in "
+                         "collector_meta.json.")
+    ap.add_argument("--klog_source", choices=("auto", "journalctl"),
+                    default="auto",
+                    help="Kernel log capture: 'auto' streams /dev/kmsg (no "
+                         "subprocess, no journald needed) and falls back to "
+                         "journalctl -k if it is unreadable; 'journalctl' "
+                         "always uses the post-run journalctl -k slice.")
+    ap.add_argument("--ready_fd", type=int, default=-1,
+                    help="Inherited pipe fd; 'ready' is written to it once "
+                         "perf has printed its first interval and the sampler "
+                         "is running, then it is closed (used by "
+                         "run_prompts_isolated.py).")
     ap.add_argument("--events", type=str, default="",
                     help="Comma-separated perf events override (optional).")
+    ap.add_argument("--pid_perf", action="store_true",
+                    help="Also run a per-process perf stat (-p <pid>) at the "
+                         "same interval for task-clock, context-switches, "
+                         "cpu-migrations and page-faults "
+                         "(pid_perf_stat.txt / pid_perf_stat.csv).")
     ap.add_argument("--llm_cpus", type=str, default="",
                     help="CPU cores reserved for the LLM, e.g. '0-11'. "
                          "If set, perf is pinned to --perf_cpu and the LLM "
                          "container is re-pinned via taskset.")
+    ap.add_argument("--isolate_cpu", type=str, default="",
+                    help="Pin the collector, perf and the sampler to one CPU: "
+                         "a CPU number, or 'auto' for the first isolcpus= CPU "
+                         "(/sys/devices/system/cpu/isolated), else the "
+                         "highest-numbered CPU available.")
     ap.add_argument("--perf_cpu", type=str, default="",
                     help="CPU core(s) for perf stat itself, e.g. '12'. "
                          "Only used when --llm_cpus is set.")
@@ -338,6 +1036,8 @@ def main() -> int:
         raise SystemExit("--perf_interval_ms must be > 0")
     if args.proc_interval_s <= 0:
         raise SystemExit("--proc_interval_s must be > 0")
+    if args.flush_interval_s <= 0:
+        raise SystemExit("--flush_interval_s must be > 0")
 
     pid = args.pid
     if not pid_exists(pid):
@@ -367,6 +1067,18 @@ def main() -> int:
     elif llm_cpus or perf_cpu:
         print("  ⚠  Both --llm_cpus and --perf_cpu must be set to enable taskset. Skipping.")
 
+    # --isolate_cpu pins the collector itself to one CPU before anything is
+    # spawned, so perf (and its sleep child) and the forked sampler inherit
+    # it and stay off the CPUs whose IRQs/tracepoints are being counted.
+    # An explicit --perf_cpu still wins for perf and the sampler.
+    isolate_cpu = pick_isolate_cpu(args.isolate_cpu) if args.isolate_cpu else None
+    if isolate_cpu is not None:
+        os.sched_setaffinity(0, {isolate_cpu})
+        print(f"  collector pinned to cpu {isolate_cpu}")
+        if llm_cpus and isolate_cpu in parse_cpu_list(llm_cpus):
+            print(f"  ⚠  cpu {isolate_cpu} is also in --llm_cpus [{llm_cpus}]; "
+                  "the collector will share a core with the LLM.")
+
     # ================================================================
     # HAT event set — tuned for Intel Xeon c6420 (Broadwell-EP)
     # ================================================================
@@ -376,7 +1088,7 @@ def main() -> int:
     # tlb:tlb_flush
     #   TLB Shootdown: fires on every TLB flush (local + cross-CPU shootdown IPI).
     #   1ms resolution enables burst_clustering and lz_complexity on the time series.
-    #   Cross-CPU shootdowns also visible in hat_TLB (/proc/interrupts, 100ms).
+    #   Cross-CPU shootdowns also visible in hat_TLB (/proc/interrupts, 97ms).
     #   Source: Linux include/trace/events/tlb.h; arch/x86/mm/tlb.c
     #
     # HAT Layer 2 — PMU hardware counters
@@ -465,6 +1177,17 @@ def main() -> int:
         "cpu-clock",
     ]
 
+    # --perf_groups: core-PMU counters as two groups of four (ratio
+    # numerator and denominator in the same group) so each group is
+    # scheduled atomically instead of being multiplexed counter by counter.
+    # Events not listed here (uncore, RAPL, MSR, software, tracepoints) use
+    # their own PMUs and stay ungrouped.
+    hat_perf_groups = (
+        ("cycles", "instructions", "branch-misses", "branch-instructions"),
+        ("cache-misses", "cache-references", "LLC-load-misses",
+         "dTLB-load-misses"),
+    )
+
     # Probe optional HAT Layer 1 events — depend on kernel config / CPU model
     probed_events: List[str] = []
     optional_hat_events = [
@@ -503,67 +1226,132 @@ def main() -> int:
     events = ([e.strip() for e in args.events.split(",") if e.strip()]
               if args.events else hat_events)
     events = events + probed_events
-    plan = PerfPlan(interval_ms=args.perf_interval_ms, events=events)
+    plan = PerfPlan(interval_ms=args.perf_interval_ms, events=events,
+                    json_output=args.perf_json,
+                    groups=hat_perf_groups if args.perf_groups else ())
 
     # Output paths
     perf_out = os.path.join(args.out_dir, "perf_stat.txt")
-    proc_out = os.path.join(args.out_dir, "proc_sample.csv")
-    hat_irq_out = os.path.join(args.out_dir, "hat_interrupts.csv")  # /proc/interrupts + CPU freq only
+    proc_bin = args.proc_format == "bin"
+    proc_out = os.path.join(args.out_dir,
+                            "proc_sample.bin" if proc_bin else "proc_sample.csv")
+    hat_bin = args.hat_format == "bin"
+    hat_irq_out = os.path.join(args.out_dir,   # /proc/interrupts + CPU freq only
+                               HAT_OUT_NAMES[args.hat_format])
     klog_out = os.path.join(args.out_dir, "kernel_log.txt")
     meta_out = os.path.join(args.out_dir, "collector_meta.json")
+    pid_perf_out = os.path.join(args.out_dir, "pid_perf_stat.txt")
+    pid_plan = PerfPlan(interval_ms=args.perf_interval_ms, events=PID_PERF_EVENTS,
+                        json_output=args.perf_json)
 
     # Write meta now (visible even if interrupted)
     t0_epoch = time.time()
     t0_ns = time.time_ns()
+    t0_mono = time.clock_gettime(time.CLOCK_MONOTONIC)
+
+    # Kernel log is streamed from /dev/kmsg for the whole window when
+    # readable; otherwise a slice is taken after the window (journalctl).
+    kmsg_fd = open_kmsg_stream() if args.klog_source == "auto" else None
+    klog_stop = threading.Event()
+    klog_thread = None
+    if kmsg_fd is not None:
+        # Started after the sampler is forked (no threads may exist at fork)
+        klog_thread = threading.Thread(target=stream_kmsg_to,
+                                       args=(kmsg_fd, klog_out, klog_stop),
+                                       daemon=True)
+
     meta = {
         "t0_epoch": t0_epoch,
         "t0_ns": t0_ns,
         "duration_s": args.duration_s,
         "perf_interval_ms": args.perf_interval_ms,
         "proc_interval_s": args.proc_interval_s,
+        "proc_format": args.proc_format,
+        "hat_format": args.hat_format,
+        "kernel_log_source": ("kmsg_stream" if klog_thread is not None else
+                              "journalctl" if args.klog_source == "journalctl"
+                              else "slice"),
+        "flush_interval_s": args.flush_interval_s,
+        "fsync": args.fsync,
         "pid": pid,
         "llm_cpus": llm_cpus,
         "perf_cpu": perf_cpu,
         "taskset_enabled": use_taskset,
+        "isolate_cpu": isolate_cpu,
         "perf_events": events,
         "probed_events": probed_events,
-        "perf_command": plan.command(args.duration_s, perf_out, cpu=perf_cpu if use_taskset else ""),
+        "perf_groups": [list(g) for g in plan.groups if set(g) <= set(events)],
+        "perf_command": plan.command(args.duration_s, None, cpu=perf_cpu if use_taskset else ""),
+        "pid_perf_command": (pid_plan.command(args.duration_s, pid_perf_out,
+                                              cpu=perf_cpu if use_taskset else "",
+                                              pid=pid)
+                             if args.pid_perf else None),
     }
     with open(meta_out, "w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
 
+    # -- /proc sampler process --
+    # Forked before perf and before the kmsg / perf reader threads start:
+    # forking a process that already runs threads can leave the child
+    # holding locks no thread will release.  The parent only supervises;
+    # SIGTERM from the runner is forwarded by _handle_sigterm below.  The
+    # child closes the fds it inherits but does not use.
+    proc_header = list(PROC_HEADER)
+    mp_ctx = multiprocessing.get_context("fork")
+    result_recv, result_send = mp_ctx.Pipe(duplex=False)
+    sampler = mp_ctx.Process(
+        target=sampler_entry,
+        args=(pid, args.duration_s, args.proc_interval_s, args.flush_interval_s,
+              proc_out, proc_bin, hat_irq_out, args.hat_format, t0_ns,
+              result_send),
+        kwargs={"fsync": args.fsync,
+                "cpus": parse_cpu_list(perf_cpu) if use_taskset else None,
+                # The ready pipe must be dropped too: if the child kept a
+                # copy, a collector dying before "ready" would not give the
+                # runner EOF and it would sit out its whole timeout.
+                "inherited_fds": tuple(fd for fd in (kmsg_fd, args.ready_fd)
+                                       if fd is not None and fd >= 0)},
+        name="proc_sampler",
+    )
+    sampler.start()
+    result_send.close()   # the child holds the only write end now
+
+    if klog_thread is not None:
+        klog_thread.start()
+
     # Start perf stat in background.
     # start_new_session=True puts perf in its own process group so that
     # SIGTERM sent to the collector by run_prompts_json.py doesn't kill
-    # perf before it can flush its -o output file.
-    perf_cmd = plan.command(args.duration_s, perf_out, cpu=perf_cpu if use_taskset else "")
+    # perf before it can flush its remaining intervals.
+    # Interval output is piped to a reader thread that writes perf_stat.txt
+    # and parses rows on the fly (no post-run re-parse of the text file).
+    perf_cmd = meta["perf_command"]
     perf_log = os.path.join(args.out_dir, "perf_stderr.log")
     with open(perf_log, "w") as perf_log_f:
-        perf_proc = subprocess.Popen(perf_cmd, stdout=subprocess.DEVNULL,
+        perf_proc = subprocess.Popen(perf_cmd, stdout=subprocess.PIPE,
                                      stderr=perf_log_f,
+                                     bufsize=1 << 20,
                                      start_new_session=True)
-
-    # -- CSV headers --
-    proc_header = [
-        "timestamp_ns",
-        "cpu_total_jiffies",
-        "cpu_idle_jiffies",
-        "pid",
-        "proc_utime_jiffies",
-        "proc_stime_jiffies",
-        "proc_rss_pages",
-    ]
-
-    # Build HAT interrupt CSV header from initial samples
-    # /proc/softirqs intentionally excluded — OS scheduling noise, not HAT-relevant
-    sample_interrupts = read_proc_interrupts()
-    sample_freq       = read_cpu_frequencies()
-
-    hat_header = ["timestamp_ns"]
-    hat_header += sorted(sample_interrupts.keys())
-    hat_header += sorted(sample_freq.keys())
-
-    t_end = time.time() + args.duration_s
+    perf_rows: dict = {}
+    perf_events_seen: dict = {}
+    perf_live = threading.Event()
+    perf_reader = threading.Thread(
+        target=_stream_perf_output,
+        args=(perf_proc.stdout, perf_out, perf_rows, perf_events_seen,
+              out_buffer_size(args.out_dir), perf_live),
+        daemon=True,
+    )
+    perf_reader.start()
+
+    # Optional per-process perf stat: same bucket interval, target PID only.
+    pid_perf_proc = None
+    pid_perf_log = os.path.join(args.out_dir, "pid_perf_stderr.log")
+    if args.pid_perf:
+        with open(pid_perf_log, "w") as pid_perf_log_f:
+            pid_perf_proc = subprocess.Popen(meta["pid_perf_command"],
+                                             stdout=subprocess.DEVNULL,
+                                             stderr=pid_perf_log_f,
+                                             start_new_session=True)
 
     # SIGTERM handler for graceful shutdown
     _stop_requested = False
@@ -571,65 +1359,82 @@ def main() -> int:
     def _handle_sigterm(signum, frame):
         nonlocal _stop_requested
         _stop_requested = True
+        if sampler.pid is not None:
+            try:
+                os.kill(sampler.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
 
     signal.signal(signal.SIGTERM, _handle_sigterm)
 
-    # -- Sampling loop --
-    with open(proc_out, "w", newline="", encoding="utf-8") as f_proc, \
-         open(hat_irq_out, "w", newline="", encoding="utf-8") as f_hat:
-
-        w_proc = csv.writer(f_proc)
-        w_proc.writerow(proc_header)
-
-        w_hat = csv.writer(f_hat)
-        w_hat.writerow(hat_header)
-
-        while time.time() < t_end and not _stop_requested:
-            if not pid_exists(pid):
-                break
-
-            ts = time.time_ns()
-
-            # Process + system CPU
-            cpu_total, cpu_idle = read_proc_stat_cpu()
-            utime, stime, rss_pages = read_proc_pid_stat(pid)
-            w_proc.writerow([ts, cpu_total, cpu_idle, pid, utime, stime, rss_pages])
-            f_proc.flush()
-
-            # HAT interrupt counts + CPU frequency
-            # /proc/softirqs intentionally not polled (OS noise, not HAT-relevant)
-            interrupts = read_proc_interrupts()
-            freq       = read_cpu_frequencies()
-
-            all_metrics = {}
-            all_metrics.update(interrupts)
-            all_metrics.update(freq)
-
-            hat_row = [ts]
-            for key in hat_header[1:]:
-                val = all_metrics.get(key)
-                hat_row.append(val if val is not None else "")
-
-            w_hat.writerow(hat_row)
-            f_hat.flush()
-
-            time.sleep(args.proc_interval_s)
-
-    # Stop perf gracefully.  SIGINT makes perf flush its -o output;
-    # SIGTERM may cause it to exit without writing the file.
-    if _stop_requested:
+    # --ready_fd: tell the runner the window is open (perf printing, sampler
+    # forked, SIGTERM handled) so it can send the prompt without losing the
+    # start of the request to collector startup.
+    if args.ready_fd >= 0:
+        perf_live.wait(timeout=READY_TIMEOUT_S)
         try:
-            os.killpg(perf_proc.pid, signal.SIGINT)
-        except (ProcessLookupError, PermissionError):
-            perf_proc.terminate()
-    try:
-        perf_proc.wait(timeout=max(10.0, args.duration_s + 5.0))
-    except subprocess.TimeoutExpired:
-        try:
-            os.killpg(perf_proc.pid, signal.SIGKILL)
-        except (ProcessLookupError, PermissionError):
-            perf_proc.kill()
-        perf_proc.wait(timeout=5.0)
+            os.write(args.ready_fd, b"ready\n")
+        except OSError:
+            pass   # runner stopped waiting; nothing to report to
+        os.close(args.ready_fd)
+
+    sampler_result, perf_failed = _await_sampler(result_recv, sampler, perf_proc)
+    meta["perf_exited_early"] = perf_failed
+    result_recv.close()
+    sampler.join()
+    if sampler.exitcode != 0:
+        print(f"  ⚠ proc sampler exited with code {sampler.exitcode}")
+
+    if proc_bin:
+        proc_bin_header, proc_bin_dtypes, _ = proc_bin_layout(proc_header,
+                                                              args.duration_s)
+        meta["proc_sample_bin"] = {
+            "columns": proc_bin_header,
+            "dtypes": proc_bin_dtypes,
+            "t0_ns": t0_ns,
+            "byteorder": sys.byteorder,
+            "layout": "columnar",
+            "rows": sampler_result.get("proc_rows"),
+        }
+    if hat_bin:
+        meta["hat_interrupts_bin"] = {
+            "columns": sampler_result.get("hat_columns"),
+            "dtype": "int64",
+            "missing": HAT_BIN_MISSING,
+            "byteorder": sys.byteorder,
+            "layout": "columnar",
+            "rows": sampler_result.get("hat_rows"),
+        }
+    elif args.hat_format == "sparse":
+        meta["hat_interrupts_sparse"] = {
+            "columns": sampler_result.get("hat_columns"),
+            "gauge_suffix": "_freq_khz",
+        }
+
+    # Stop perf gracefully (SIGINT so it flushes its -o output).
+    perf_wait_s = max(10.0, args.duration_s + 5.0)
+    _stop_perf(perf_proc, _stop_requested, perf_wait_s)
+    if pid_perf_proc is not None:
+        _stop_perf(pid_perf_proc, _stop_requested, perf_wait_s)
+    perf_reader.join(timeout=10.0)
+
+    # Kernel log -- always collected (MCE, thermal, hardware errors).
+    # The window closes here, when collection stops; the journalctl /
+    # kmsg slice then runs in a thread alongside the perf CSV work below
+    # instead of after it.
+    t1_epoch = time.time()
+    t1_ns = time.time_ns()
+    t1_mono = time.clock_gettime(time.CLOCK_MONOTONIC)
+    if klog_thread is not None:
+        klog_stop.set()
+    else:
+        klog_thread = threading.Thread(
+            target=write_kernel_log_slice,
+            args=(klog_out, t0_epoch, t1_epoch, t0_mono, t1_mono),
+            kwargs={"use_kmsg": args.klog_source == "auto"},
+            daemon=True,
+        )
+        klog_thread.start()
 
     # Post-process perf CSV (only if perf actually produced output)
     perf_csv_out = os.path.join(args.out_dir, "perf_stat.csv")
@@ -641,25 +1446,35 @@ def main() -> int:
             if err_text:
                 for ln in err_text.splitlines()[:20]:
                     print(f"    {ln}")
-    if os.path.isfile(perf_out) and os.path.getsize(perf_out) > 0:
+    if perf_rows:
+        _write_perf_csv(perf_rows, perf_events_seen, perf_csv_out)
+    elif os.path.isfile(perf_out) and os.path.getsize(perf_out) > 0:
         _postprocess_perf_csv(perf_out, perf_csv_out)
     else:
         print(f"  ⚠ {perf_out} not found or empty — perf stat may have failed.")
         print(f"    Check {perf_log} for details.")
 
-    # Kernel log slice -- always collected (MCE, thermal, hardware errors)
-    t1_epoch = time.time()
-    write_kernel_log_slice(klog_out, t0_epoch, t1_epoch)
+    pid_perf_csv_out = os.path.join(args.out_dir, "pid_perf_stat.csv")
+    if pid_perf_proc is not None:
+        if os.path.isfile(pid_perf_out) and os.path.getsize(pid_perf_out) > 0:
+            _postprocess_perf_csv(pid_perf_out, pid_perf_csv_out)
+        else:
+            print(f"  ⚠ {pid_perf_out} not found or empty — check {pid_perf_log}.")
+
+    # The stream thread only has to drain; the slice must finish writing.
+    klog_thread.join(timeout=5.0 if kmsg_fd is not None else None)
 
     # Update meta with end times
     meta["t1_epoch"] = t1_epoch
-    meta["t1_ns"] = time.time_ns()
+    meta["t1_ns"] = t1_ns
     with open(meta_out, "w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
 
     print(f"Wrote: {args.out_dir}/")
     print(f"  perf raw:       {perf_out}")
     print(f"  perf csv:       {perf_csv_out}")
+    if pid_perf_proc is not None:
+        print(f"  pid perf csv:   {pid_perf_csv_out}")
     print(f"  proc:           {proc_out}")
     print(f"  hat_interrupts: {hat_irq_out}")
     print(f"  kernel log:     {klog_out}")
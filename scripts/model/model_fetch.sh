@@ -27,7 +27,7 @@ case "$MODEL_SIZE" in
     HEALTH_SLEEP=2
     REQUEST_TIMEOUT=600
     BASELINE_S=2
-    PROC_INTERVAL_S=0.1
+    PROC_INTERVAL_S=0.097
     ;;
   70b)
     MODEL_FILE="${MODEL_DIR}/llama-3.1-70b.Q4_K_M.gguf"
@@ -40,7 +40,7 @@ case "$MODEL_SIZE" in
     HEALTH_SLEEP=5
     REQUEST_TIMEOUT=3600
     BASELINE_S=5
-    PROC_INTERVAL_S=0.1
+    PROC_INTERVAL_S=0.097
     ;;
   *)
     echo "Usage: $0 [7b|70b]"
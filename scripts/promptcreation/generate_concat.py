@@ -29,30 +29,32 @@ print(f"Loaded {len(prompts)} prompts from {INFILE}")
 if len(prompts) != 5:
     raise ValueError(f"Expected 5 prompts, got {len(prompts)}. Check the input file.")
 
+# Strip each prompt and grab its title once; permutations are built over
+# indices so each concatenation only joins precomputed strings.
+stripped = [p['instructions'].strip() for p in prompts]
+titles_all = [p['title'] for p in prompts]
+
 # Get all permutations of the 5 prompts
-perms = list(itertools.permutations(prompts, 5))
+perms = list(itertools.permutations(range(len(prompts)), 5))
 if len(perms) != 120:
     raise RuntimeError(f"Expected 120 permutations, got {len(perms)}. Check input prompts.")
 
-# Build concatenated objects — report token count for first permutation immediately
-concat_objs = []
-for idx, perm in enumerate(perms, 1):
-    concat_text = '\n\n'.join(p['instructions'].strip() for p in perm)
-    titles = [p['title'] for p in perm]
-    obj = {
+concat_objs = [
+    {
         'id': idx,
-        'titles': titles,
-        'instructions': concat_text
+        'titles': [titles_all[j] for j in perm],
+        'instructions': '\n\n'.join([stripped[j] for j in perm]),
     }
-    concat_objs.append(obj)
-
-    # Report token count right after the first permutation is built
-    if idx == 1:
-        n_tokens = count_tokens(concat_text)
-        n_chars  = len(concat_text)
-        n_words  = len(concat_text.split())
-        print(f"\nFirst permutation (id=1, titles={titles}):")
-        print(f"  chars={n_chars}  words={n_words}  tokens={n_tokens if n_tokens is not None else 'N/A'}")
+    for idx, perm in enumerate(perms, 1)
+]
+
+# Report token count for the first permutation
+first = concat_objs[0]
+n_tokens = count_tokens(first['instructions'])
+n_chars  = len(first['instructions'])
+n_words  = len(first['instructions'].split())
+print(f"\nFirst permutation (id=1, titles={first['titles']}):")
+print(f"  chars={n_chars}  words={n_words}  tokens={n_tokens if n_tokens is not None else 'N/A'}")
 
 # Write output
 with open(OUTFILE, 'w') as f:
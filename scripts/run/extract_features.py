@@ -6,7 +6,7 @@ Standalone feature-extraction script for all mccviahat run directories.
 
 For every split defined in RUN_SPLITS it:
   1. Walks every p???? trial directory
-  2. Loads perf_stat.csv + hat_interrupts.csv
+  2. Loads perf_stat.csv + hat_interrupts.csv (or hat_interrupts_sparse.csv)
   3. Computes the same 10 metrics per indicator used in hat_clustering_analysis.ipynb
   4. Saves one CSV per split to  data/<split>.csv
   5. Also saves a combined  data/features.csv  (training sets only, for backwards compat)
@@ -79,13 +79,40 @@ def load_perf(trial_dir: Path) -> pd.DataFrame | None:
     return None
 
 
+def _parse_perf_json_record(line: str) -> tuple | None:
+    """(t_s, event, value) from one perf stat -j record (collector
+    --perf_json), or None if the line is not an interval record."""
+    try:
+        rec = json.loads(line)
+        ts = float(rec['interval'])
+        event = rec['event']
+    except (ValueError, KeyError, TypeError):
+        return None
+    try:
+        val = float(rec.get('counter-value', ''))
+    except (ValueError, TypeError):      # "<not counted>", "<not supported>"
+        val = float('nan')
+    return ts, event, val
+
+
 def _parse_perf_txt(path: Path) -> pd.DataFrame:
+    """Wide perf table from raw perf_stat.txt, in either the -x ',' CSV
+    format or the one-JSON-object-per-line format of --perf_json."""
     rows_by_ts: dict = OrderedDict()
     events_seen: list = []
     for line in path.read_text(encoding='utf-8', errors='replace').splitlines():
         line = line.strip()
         if not line or line.startswith('#'):
             continue
+        if line.startswith('{'):
+            rec = _parse_perf_json_record(line)
+            if rec is None:
+                continue
+            ts, event, val = rec
+            if event not in events_seen:
+                events_seen.append(event)
+            rows_by_ts.setdefault(ts, {})[event] = val
+            continue
         parts = line.split(',')
         if len(parts) < 4:
             continue
@@ -107,11 +134,41 @@ def _parse_perf_txt(path: Path) -> pd.DataFrame:
     return pd.DataFrame(records).sort_values('t_s').reset_index(drop=True)
 
 
+def _load_hat_sparse(trial_dir: Path) -> pd.DataFrame | None:
+    """Rebuild the wide, cumulative hat_interrupts table from
+    hat_interrupts_sparse.csv (collector --hat_format sparse)."""
+    p = trial_dir / 'hat_interrupts_sparse.csv'
+    meta_p = trial_dir / 'collector_meta.json'
+    if not p.exists() or p.stat().st_size == 0 or not meta_p.exists():
+        return None
+    layout = json.loads(meta_p.read_text()).get('hat_interrupts_sparse')
+    if not layout:
+        return None
+    cols = layout['columns']
+    gauge = [c.endswith(layout.get('gauge_suffix', '_freq_khz')) for c in cols]
+    cur = [np.nan if g else 0 for g in gauge]
+    rows = []
+    with open(p, encoding='utf-8') as f:
+        next(f)                                  # timestamp_ns,changes
+        for line in f:
+            ts, _, changes = line.rstrip('\n').partition(',')
+            for tok in changes.split():
+                i, _, v = tok.partition(':')
+                i = int(i)
+                cur[i] = int(v) if gauge[i] else cur[i] + int(v)
+            cur[0] = int(ts)
+            rows.append(list(cur))
+    return pd.DataFrame(rows, columns=cols)
+
+
 def load_hat_interrupts(trial_dir: Path) -> pd.DataFrame | None:
     p = trial_dir / 'hat_interrupts.csv'
-    if not p.exists() or p.stat().st_size == 0:
-        return None
-    df = pd.read_csv(p)
+    if p.exists() and p.stat().st_size > 0:
+        df = pd.read_csv(p)
+    else:
+        df = _load_hat_sparse(trial_dir)
+        if df is None:
+            return None
     df['t_s'] = (df['timestamp_ns'] - df['timestamp_ns'].iloc[0]) / 1e9
     irq_cols = [c for c in df.columns
                 if c not in ('timestamp_ns', 't_s')
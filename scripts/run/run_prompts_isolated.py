@@ -12,9 +12,10 @@ For each prompt:
   1. Reset the LLM server (scripts/reset_server.sh)
   2. Drop hardware caches (via sysctl / drop_caches)
   3. Sleep a short stabilisation baseline
-  4. Start substrate_collector.py (scoped to this prompt only)
-  5. Send the prompt via curl
-  6. SIGTERM the collector immediately after curl returns
+  4. Start substrate_collector.py (scoped to this prompt only) and wait
+     until it reports its measurement window open
+  5. Send the prompt (HTTP POST on a reused http.client connection)
+  6. SIGTERM the collector immediately after the response returns
   7. Write minimal metadata (prompt index, label, timing, ok)
 
 Directory layout:
@@ -29,12 +30,16 @@ Directory layout:
 """
 
 import argparse
+import compileall
+import http.client
 import json
 import os
 import re
+import select
 import subprocess
 import time
 from pathlib import Path
+from urllib.parse import urlsplit
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -47,7 +52,7 @@ _MODEL_DEFAULTS = {
     "REQUEST_TIMEOUT":  "600",
     "RESET_TIMEOUT":    "90",
     "BASELINE_S":       "2",
-    "PROC_INTERVAL_S":  "0.1",
+    "PROC_INTERVAL_S":  "0.097",
 }
 
 def load_model_config(config_path: str) -> dict:
@@ -76,6 +81,27 @@ def load_model_config(config_path: str) -> dict:
 # Helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
+def parse_cpu_list(text: str) -> set[int]:
+    """Parse a cpulist string ("12", "12,13", "0-3,8") into a set of CPU ids."""
+    cpus: set[int] = set()
+    for part in text.split(","):
+        part = part.strip()
+        if part:
+            lo, _, hi = part.partition("-")
+            cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def pin_runner(cpus: set[int]) -> None:
+    """Keep the runner (and the collector it spawns) off the LLM's cores."""
+    os.sched_setaffinity(0, cpus)
+    try:
+        os.nice(-5)
+    except PermissionError:
+        pass   # no CAP_SYS_NICE: keep the default nice level
+    print(f"  runner pinned to cpus {sorted(cpus)}")
+
+
 def sh(cmd: list[str], check: bool = True, timeout: float = 30.0) -> str:
     return subprocess.check_output(cmd, text=True, timeout=timeout).strip() if check else ""
 
@@ -89,7 +115,12 @@ def get_container_pid(container: str) -> int:
     return int(raw)
 
 
-def reset_server(reset_script: str, timeout: float = 90.0) -> None:
+# llama_up.sh ends with "PID: <host pid>" (from its own docker inspect)
+_RESET_PID_RE = re.compile(r"^PID: (\d+)$", re.MULTILINE)
+
+
+def reset_server(reset_script: str, timeout: float = 90.0) -> int | None:
+    """Run reset_server.sh; return the new container's host PID if it printed one."""
     result = subprocess.run(
         ["bash", reset_script],
         timeout=timeout,
@@ -102,18 +133,94 @@ def reset_server(reset_script: str, timeout: float = 90.0) -> None:
             f"  stdout: {result.stdout.strip()}\n"
             f"  stderr: {result.stderr.strip()}"
         )
+    m = _RESET_PID_RE.findall(result.stdout)
+    return int(m[-1]) if m else None
+
 
+_DROP_CACHES_CMD = "sync && echo 3 > /proc/sys/vm/drop_caches"
+_SUDO_SH_DONE = "__mccviahat_done__"
 
-def drop_caches() -> None:
+
+def open_sudo_shell() -> subprocess.Popen:
+    """One long-lived `sudo -n sh` fed commands on stdin (one sudo per run)."""
+    return subprocess.Popen(
+        ["sudo", "-n", "sh"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+
+
+def sudo_shell_run(shell: subprocess.Popen, cmd: str,
+                   timeout: float = 10.0) -> tuple[int, str]:
+    """Run cmd in the sudo shell; return (exit status, combined output).
+
+    Raises RuntimeError if the shell has gone away (e.g. sudo -n was refused)
+    or cmd does not finish within timeout.
+    """
+    try:
+        shell.stdin.write(
+            f"{{ {cmd} ; }} 2>&1; echo \"{_SUDO_SH_DONE} $?\"\n".encode())
+        shell.stdin.flush()
+    except (BrokenPipeError, ValueError):
+        raise RuntimeError("sudo shell is not running")
+    fd = shell.stdout.fileno()
+    out = b""
+    deadline = time.monotonic() + timeout
+    marker = _SUDO_SH_DONE.encode() + b" "
+    while marker not in out or not out.endswith(b"\n"):
+        left = deadline - time.monotonic()
+        if left <= 0 or not select.select([fd], [], [], left)[0]:
+            shell.kill()   # its late output would be misread by the next call
+            raise RuntimeError(f"sudo shell: '{cmd}' timed out after {timeout}s")
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise RuntimeError(f"sudo shell exited: {out.decode(errors='replace').strip()}")
+        out += chunk
+    text, _, status = out.decode(errors="replace").rpartition(_SUDO_SH_DONE + " ")
+    return int(status), text.strip()
+
+
+def drop_caches(sudo_shell: subprocess.Popen | None = None) -> None:
+    # As root, sync + write drop_caches in-process (no sudo/sh fork per prompt)
+    if os.geteuid() == 0:
+        try:
+            os.sync()
+            with open("/proc/sys/vm/drop_caches", "w") as f:
+                f.write("3")
+        except OSError as e:
+            print(f"  ⚠  drop_caches failed: {e}")
+        return
+    if sudo_shell is not None and sudo_shell.poll() is None:
+        try:
+            rc, out = sudo_shell_run(sudo_shell, _DROP_CACHES_CMD)
+        except RuntimeError as e:
+            print(f"  ⚠  drop_caches failed: {e}")
+            return
+        if rc != 0:
+            print(f"  ⚠  drop_caches failed: {out}")
+        return
+    # No helper shell (or it has exited): one sudo for this call
     try:
         subprocess.run(
-            ["sudo", "-n", "sh", "-c", "sync && echo 3 > /proc/sys/vm/drop_caches"],
-            check=True, capture_output=True, timeout=10.0,
+            ["sudo", "-n", "sh", "-c", _DROP_CACHES_CMD],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True, timeout=10.0,
         )
     except subprocess.CalledProcessError as e:
         print(f"  ⚠  drop_caches failed: {e.stderr.strip()}")
 
 
+# Runs the collector as an imported module rather than as __main__, so its
+# bytecode comes from __pycache__ instead of being recompiled on every
+# launch.  -S skips site.py (the collector is stdlib-only), -E ignores
+# PYTHON* environment variables.
+_COLLECTOR_BOOT = (
+    "import importlib, os, sys; sys.argv = sys.argv[1:]; p = sys.argv[0]; "
+    "sys.path.insert(0, os.path.dirname(os.path.abspath(p))); "
+    "sys.exit(importlib.import_module("
+    "os.path.splitext(os.path.basename(p))[0]).main())"
+)
+
+
 def start_collector(
     out_dir: Path,
     pid: int,
@@ -123,11 +230,25 @@ def start_collector(
     collector_path: str,
     llm_cpus: str = "",
     perf_cpu: str = "",
+    pid_perf: bool = False,
+    isolate_cpu: str = "",
+    ready_timeout_s: float = 15.0,
 ) -> tuple[subprocess.Popen, object]:
+    """Start the collector and wait until its measurement window is open.
+
+    The collector reports ready on an inherited pipe once perf is printing
+    and its sampler runs, so the prompt is not sent while Python, sudo and
+    perf are still starting (which would cut the start of the request out
+    of the trace).
+    """
     log_path = out_dir / "collector_stdout.log"
-    log_f = open(log_path, "w", encoding="utf-8")
+    # The collector writes straight to this fd; the runner never writes
+    # through it, so no text/buffer layer on our side.
+    log_f = open(log_path, "wb", buffering=0)
+    # Append-only log: let the kernel write it back / read it ahead as a stream
+    os.posix_fadvise(log_f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
     cmd = [
-        "python3", collector_path,
+        "python3", "-E", "-S", "-c", _COLLECTOR_BOOT, collector_path,
         "--out_dir", str(out_dir),
         "--pid", str(pid),
         "--duration_s", str(duration_s),
@@ -136,7 +257,27 @@ def start_collector(
     ]
     if llm_cpus and perf_cpu:
         cmd += ["--llm_cpus", llm_cpus, "--perf_cpu", perf_cpu]
-    proc = subprocess.Popen(cmd, stdout=log_f, stderr=subprocess.STDOUT)
+    if pid_perf:
+        cmd.append("--pid_perf")
+    if isolate_cpu:
+        cmd += ["--isolate_cpu", isolate_cpu]
+    ready_r, ready_w = os.pipe()
+    cmd += ["--ready_fd", str(ready_w)]
+    try:
+        proc = subprocess.Popen(cmd, stdout=log_f, stderr=subprocess.STDOUT,
+                                pass_fds=(ready_w,))
+    finally:
+        os.close(ready_w)
+    try:
+        # EOF (collector exited early) also wakes this up
+        if not select.select([ready_r], [], [], ready_timeout_s)[0]:
+            print(f"  ⚠  collector not ready after {ready_timeout_s}s; "
+                  "sending prompt anyway")
+        elif os.read(ready_r, 64) != b"ready\n":
+            print("  ⚠  collector exited before its window opened; "
+                  f"see {log_path}")
+    finally:
+        os.close(ready_r)
     return proc, log_f
 
 
@@ -152,33 +293,134 @@ def stop_collector(
     log_f.close()
 
 
+def open_server_connection(server_url: str,
+                           timeout_s: float) -> tuple[http.client.HTTPConnection, str]:
+    """One HTTPConnection for the whole run (no curl fork+exec per prompt).
+
+    Returns (conn, request_path).  The socket is opened lazily by the first
+    request and re-opened the same way after conn.close().
+    """
+    u = urlsplit(server_url)
+    cls = (http.client.HTTPSConnection if u.scheme == "https"
+           else http.client.HTTPConnection)
+    conn = cls(u.hostname, u.port, timeout=timeout_s)
+    return conn, (u.path or "/") + (f"?{u.query}" if u.query else "")
+
+
+def build_payload_suffix(n_predict: int) -> bytes:
+    """Encode the prompt-independent part of the /completion body once.
+
+    send_prompt() splices the JSON-escaped prompt in front of it; the
+    result is byte-identical to json.dumps() of the whole dict.
+    """
+    return json.dumps({
+        "n_predict": n_predict,
+        "ignore_eos": True,
+        "logit_bias": [[2, -100.0]],
+    })[1:].encode("utf-8")
+
+
+def set_conn_timeout(conn: http.client.HTTPConnection,
+                     timeout_s: float) -> None:
+    """Set the per-operation timeout for conn's next connect and, if a
+    socket is already open, for its next send/recv."""
+    conn.timeout = timeout_s
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout_s)
+
+
+def wait_until_idle(
+    conn: http.client.HTTPConnection,
+    deadline: float,
+    poll_ms: float = 5.0,
+    quiet_ms: float = 200.0,
+    probe_timeout_s: float = 0.5,
+) -> bool:
+    """Poll GET /health until it has answered 200 continuously for quiet_ms.
+
+    Returns False if time.monotonic() passes deadline first (the caller's
+    baseline_s bound).  Uses the run's persistent connection, with each
+    probe capped at probe_timeout_s and never past deadline, so a stalled
+    probe cannot hold the loop for the long request timeout; that timeout
+    is restored on return.
+    """
+    request_timeout_s = conn.timeout
+    ok_since = None
+    try:
+        while True:
+            set_conn_timeout(conn, min(max(deadline - time.monotonic(), 0.005),
+                                       probe_timeout_s))
+            try:
+                conn.request("GET", "/health")
+                resp = conn.getresponse()
+                resp.read()
+                healthy = resp.status == 200
+            except (OSError, http.client.HTTPException):   # incl. timeouts
+                conn.close()
+                healthy = False
+            now = time.monotonic()
+            if not healthy:
+                ok_since = None
+            elif ok_since is None:
+                ok_since = now
+            elif (now - ok_since) * 1000.0 >= quiet_ms:
+                return True
+            if now >= deadline:
+                return False
+            time.sleep(min(poll_ms / 1000.0, max(0.0, deadline - now)))
+    finally:
+        set_conn_timeout(conn, request_timeout_s)
+
+
 def send_prompt(
     prompt_text: str,
-    n_predict: int,
-    server_url: str,
+    payload_suffix: bytes,
+    conn: http.client.HTTPConnection,
+    path: str,
     timeout_s: float,
 ) -> tuple[bool, str]:
-    payload = json.dumps({
-        "prompt": prompt_text,
-        "n_predict": n_predict,
-        "ignore_eos": True,
-        "logit_bias": [[2, -100.0]],
-    })
+    """POST one prompt; the whole exchange is bounded by timeout_s.
+
+    A socket timeout only bounds each connect/recv, so a server that
+    trickles bytes could otherwise run on indefinitely.  The body is read
+    one recv at a time with the socket timeout shrunk to what is left.
+    """
+    payload = (b'{"prompt": ' + json.dumps(prompt_text).encode("utf-8")
+               + b", " + payload_suffix)
+    deadline = time.monotonic() + timeout_s
+
+    def _left() -> float:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError(f"request exceeded {timeout_s:g}s")
+        return left
+
+    request_timeout_s = conn.timeout
     try:
-        out = subprocess.check_output(
-            [
-                "curl", "-sS",
-                "--max-time", str(int(timeout_s)),
-                server_url,
-                "-H", "Content-Type: application/json",
-                "-d", payload,
-            ],
-            text=True,
-            timeout=timeout_s + 5.0,
-        )
-        return True, out
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        set_conn_timeout(conn, _left())
+        conn.request("POST", path, body=payload,
+                     headers={"Content-Type": "application/json",
+                              "Connection": "keep-alive"})
+        # Held directly: getresponse() drops conn.sock on Connection: close
+        sock = conn.sock
+        sock.settimeout(_left())
+        resp = conn.getresponse()
+        chunks = []
+        while True:
+            sock.settimeout(_left())
+            chunk = resp.read1(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        # read1() does not mark a Content-Length body done; read() of the
+        # zero bytes left does, freeing conn for the next request
+        resp.read()
+        return True, b"".join(chunks).decode("utf-8", errors="replace")
+    except (OSError, http.client.HTTPException) as e:
+        conn.close()   # drop the broken socket; the next request reconnects
         return False, str(e)
+    finally:
+        conn.timeout = request_timeout_s
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -236,7 +478,8 @@ def run() -> None:
                     help="Stabilisation sleep after reset (s).")
     ap.add_argument("--per_request_timeout_s", type=float,
                     default=float(cfg["REQUEST_TIMEOUT"]),
-                    help="Hard timeout for each curl request (s).")
+                    help="Overall time limit for each prompt request, "
+                         "connect to last byte (s).")
     ap.add_argument("--reset_timeout_s", type=float,
                     default=float(cfg["RESET_TIMEOUT"]),
                     help="Max time to wait for reset_server.sh (s).")
@@ -255,8 +498,41 @@ def run() -> None:
                     help="CPU cores for LLM container (enables taskset).")
     ap.add_argument("--perf_cpu", type=str, default="",
                     help="CPU core for perf stat (enables taskset).")
+    ap.add_argument("--pid_perf", action="store_true",
+                    help="Also collect per-process perf stat for the LLM PID.")
+    ap.add_argument("--baseline_probe", action="store_true",
+                    help="End the baseline as soon as the server's /health "
+                         "has answered 200 continuously for 200 ms, polling "
+                         "every 5 ms; --baseline_s becomes the upper bound.")
+    ap.add_argument("--isolate_cpu", type=str, default="",
+                    help="Pin the collector, perf and its sampler to one CPU "
+                         "(a number, or 'auto').  Keep it outside --llm_cpus "
+                         "/ the container cpuset so the collector's own work "
+                         "does not land on the LLM's cores.")
     args = ap.parse_args()
 
+    # Same rule as the collector's pick_isolate_cpu, checked here so a typo
+    # fails before the server is reset rather than mid-run.
+    isolate_spec = args.isolate_cpu.strip()
+    if isolate_spec and isolate_spec.lower() != "auto":
+        try:
+            int(isolate_spec)
+        except ValueError:
+            raise SystemExit("--isolate_cpu must be a CPU number or 'auto', "
+                             f"got {args.isolate_cpu!r}")
+
+    # With taskset isolation on, the runner shares the perf core instead of
+    # floating onto the LLM's cores during the measurement window.  The
+    # collector inherits this mask, so an explicit --isolate_cpu is added
+    # to it; with --isolate_cpu auto the collector must still see every CPU
+    # to pick from, and the runner is left unpinned.
+    if (args.llm_cpus and args.perf_cpu
+            and isolate_spec.lower() != "auto"):
+        runner_cpus = parse_cpu_list(args.perf_cpu)
+        if isolate_spec:
+            runner_cpus.add(int(isolate_spec))
+        pin_runner(runner_cpus)
+
     # ── Print active config so the user can verify ────────────────────────────
     print(f"\n{'='*60}")
     print(f"  Model              : {cfg['MODEL_SIZE']}")
@@ -267,7 +543,8 @@ def run() -> None:
     print(f"{'='*60}\n")
 
     # ── Load prompts ──────────────────────────────────────────────────────────
-    prompts: list[dict] = json.load(open(args.json, "r", encoding="utf-8"))
+    with open(args.json, "rb") as f:
+        prompts: list[dict] = json.load(f)
     if not isinstance(prompts, list) or len(prompts) == 0:
         raise SystemExit("JSON must be a non-empty list of objects.")
 
@@ -296,18 +573,40 @@ def run() -> None:
         prompts = prompts[: args.n_prompts]
     print(f"Starting from index {args.start_index} → {len(prompts)} prompt(s) to run\n")
 
-    # ── Per-prompt loop ───────────────────────────────────────────────────────
+    # ── Trial directories ─────────────────────────────────────────────────────
+    # Created up front (one mkdir per label root, one per trial) so no
+    # filesystem setup happens in the idle gap between prompts.
+    trial_dirs: list[tuple[str, Path]] = []
     for i, prompt_obj in enumerate(prompts):
-        idx = args.start_index + i
-        label = args.label if args.label is not None else prompt_obj["condition"]
-        file_idx = prompt_obj.get("mixed_index", idx)
-
         instr = prompt_obj.get("instructions", "")
         if not isinstance(instr, str) or not instr.strip():
-            raise SystemExit(f"Prompt {idx}: missing or empty 'instructions' field.")
+            raise SystemExit(f"Prompt {args.start_index + i}: missing or empty "
+                             "'instructions' field.")
+        label = args.label if args.label is not None else prompt_obj["condition"]
+        file_idx = prompt_obj.get("mixed_index", args.start_index + i)
+        trial_dirs.append((label, Path("runs") / label / f"p{file_idx:04d}"))
+    for root in {out_dir.parent for _, out_dir in trial_dirs}:
+        root.mkdir(parents=True, exist_ok=True)
+    for _, out_dir in trial_dirs:
+        out_dir.mkdir(exist_ok=True)
+
+    # Compile the collector's modules once so each per-prompt launch only
+    # loads cached bytecode
+    compileall.compile_dir(str(Path(args.collector).resolve().parent),
+                           maxlevels=0, quiet=1)
+
+    conn, request_path = open_server_connection(args.server_url,
+                                                args.per_request_timeout_s)
+    payload_suffix = build_payload_suffix(args.n_predict)
+    # Unprivileged runs: one sudo for the whole run instead of one per prompt
+    sudo_shell = open_sudo_shell() if os.geteuid() != 0 else None
 
-        out_dir = Path("runs") / label / f"p{file_idx:04d}"
-        out_dir.mkdir(parents=True, exist_ok=True)
+    # ── Per-prompt loop ───────────────────────────────────────────────────────
+    for i, prompt_obj in enumerate(prompts):
+        idx = args.start_index + i
+        label, out_dir = trial_dirs[i]
+
+        instr = prompt_obj["instructions"]
 
         print(
             f"[{idx+1}/{n_total}] prompt={idx}  label={label}  out={out_dir}",
@@ -317,31 +616,52 @@ def run() -> None:
         # 1. Reset server
         print("  → resetting server ...", flush=True)
         try:
-            reset_server(args.reset_script, timeout=args.reset_timeout_s)
+            reset_pid = reset_server(args.reset_script, timeout=args.reset_timeout_s)
         except RuntimeError as e:
             print(f"  ✗ {e}")
             (out_dir / "trial_meta.json").write_text(
                 json.dumps(
                     {"prompt_index": idx, "label": label, "ok": False,
                      "error": "reset_failed"},
-                    indent=2,
-                )
+                    separators=(",", ":"),
+                ),
+                encoding="utf-8",
             )
             continue
+        # The reset restarted llama-server, so any kept-alive socket is dead
+        conn.close()
 
         # 2. Drop hardware caches
         print("  → dropping caches ...", flush=True)
-        drop_caches()
-
-        # 3. Stabilisation baseline
-        print(f"  → baseline sleep {args.baseline_s}s ...", flush=True)
-        time.sleep(args.baseline_s)
-
-        # 4. Resolve container PID (after reset)
-        pid = get_container_pid(args.container)
+        drop_caches(sudo_shell)
+
+        # 3. Stabilisation baseline.  The PID lookup (4) runs inside it and
+        # only the remainder is slept, so a docker inspect fallback does not
+        # add to the per-prompt setup time.  The window itself still spans
+        # the full baseline_s between drop_caches and collector start.
+        if args.baseline_probe:
+            print(f"  → baseline: /health probe (max {args.baseline_s}s) ...",
+                  flush=True)
+        else:
+            print(f"  → baseline sleep {args.baseline_s}s ...", flush=True)
+        baseline_end = time.monotonic() + args.baseline_s
+
+        # 4. Resolve container PID (after reset).  The reset recreates the
+        # container, so the PID changes every prompt; reuse the one
+        # llama_up.sh already looked up instead of a second docker inspect.
+        if reset_pid is not None and os.path.isdir(f"/proc/{reset_pid}"):
+            pid = reset_pid
+        else:
+            pid = get_container_pid(args.container)
         print(f"  Container '{args.container}' → host PID {pid}")
-
-        # 5. Start collector (runs for the full request timeout + tail)
+        if args.baseline_probe:
+            if not wait_until_idle(conn, baseline_end):
+                print("  ⚠  /health not steadily ok within baseline_s; continuing")
+        else:
+            time.sleep(max(0.0, baseline_end - time.monotonic()))
+
+        # 5. Start collector.  send_prompt() gives up after
+        # per_request_timeout_s in total, so this outlasts any request.
         collector_duration_s = args.per_request_timeout_s + 5.0
         print("  → starting collector ...", flush=True)
         collector_proc, collector_log_f = start_collector(
@@ -353,22 +673,30 @@ def run() -> None:
             collector_path=args.collector,
             llm_cpus=args.llm_cpus,
             perf_cpu=args.perf_cpu,
+            pid_perf=args.pid_perf,
+            isolate_cpu=args.isolate_cpu,
         )
 
         # 6. Send prompt
         print("  → sending prompt ...", flush=True)
+        # Latency comes from the monotonic perf counter (no NTP slew/steps
+        # mid-request); one wall-clock anchor read places it in epoch time
+        # for alignment with the collector's timestamps.
         t_req_start = time.time_ns()
+        t_perf_start = time.perf_counter_ns()
         ok, response_raw = send_prompt(
             prompt_text=instr,
-            n_predict=args.n_predict,
-            server_url=args.server_url,
+            payload_suffix=payload_suffix,
+            conn=conn,
+            path=request_path,
             timeout_s=args.per_request_timeout_s,
         )
-        t_req_end = time.time_ns()
-        elapsed_ms = (t_req_end - t_req_start) / 1e6
+        elapsed_ns = time.perf_counter_ns() - t_perf_start
+        t_req_end = t_req_start + elapsed_ns
+        elapsed_ms = elapsed_ns / 1e6
         print(f"  → done  ok={ok}  elapsed={elapsed_ms:.0f}ms", flush=True)
 
-        # 7. Stop collector immediately after curl returns
+        # 7. Stop collector immediately after the response returns
         print("  → stopping collector ...", flush=True)
         stop_collector(collector_proc, collector_log_f)
 
@@ -383,7 +711,7 @@ def run() -> None:
             "elapsed_ms":      elapsed_ms,
         }
         (out_dir / "trial_meta.json").write_text(
-            json.dumps(trial_meta, indent=2), encoding="utf-8"
+            json.dumps(trial_meta, separators=(",", ":")), encoding="utf-8"
         )
 
         if not ok:
@@ -391,6 +719,10 @@ def run() -> None:
                 response_raw, encoding="utf-8"
             )
 
+    conn.close()
+    if sudo_shell is not None:
+        sudo_shell.stdin.close()
+        sudo_shell.wait()
     dest = args.label if args.label else "<per-prompt-condition>"
     print(f"\n✓ Done. Results in runs/{dest}/")
 
@@ -154,7 +154,7 @@ def process_file(path: Path, tokenizer, add_bos: bool) -> list[dict]:
         sys.exit(f"ERROR: {path} is not a JSON array at the top level.")
 
     condition = infer_condition(path.stem)
-    rows = []
+    entries = []
     for prompt_index, obj in enumerate(data):
         if "instructions" not in obj:
             print(
@@ -163,16 +163,24 @@ def process_file(path: Path, tokenizer, add_bos: bool) -> list[dict]:
                 file=sys.stderr,
             )
             continue
-        text     = obj["instructions"]
-        n_tokens = len(tokenizer.encode(text, add_special_tokens=add_bos))
-        rows.append(
-            {
-                "condition":    condition,
-                "prompt_index": prompt_index,
-                "n_tokens":     n_tokens,
-                "title":        obj.get("title", ""),
-            }
-        )
+        entries.append((prompt_index, obj))
+
+    # One batched call per file: fast tokenizers encode the whole list in
+    # Rust (in parallel) instead of one Python→Rust round trip per prompt.
+    token_ids = tokenizer(
+        [obj["instructions"] for _, obj in entries],
+        add_special_tokens=add_bos,
+    )["input_ids"] if entries else []
+
+    rows = [
+        {
+            "condition":    condition,
+            "prompt_index": prompt_index,
+            "n_tokens":     len(ids),
+            "title":        obj.get("title", ""),
+        }
+        for (prompt_index, obj), ids in zip(entries, token_ids)
+    ]
     return rows
 
 